@@ -4,15 +4,20 @@ import subprocess
 import shutil
 import glob
 import time
-import re
 import argparse
-from itertools import chain
+import filecmp
 
 
 ROOT_DIR = os.path.realpath(os.path.dirname(__file__))
+CORE_DIR = os.path.join(ROOT_DIR, 'core')
+LLVM_DIR = os.path.join(ROOT_DIR, 'frontends', 'llvm')
+RUNTIME_DIR = os.path.join(ROOT_DIR, 'runtime')
+PYTHON_DIR = os.path.join(ROOT_DIR, 'frontends', 'python')
 DEFAULT_DEST_DIR = os.path.join(os.path.expanduser('~'), '.aardwolf')
 
 LOG_INDENT = 0
+# Precomputed indentation strings, the nesting is never deep.
+LOG_INDENTS = tuple('  ' * level for level in range(16))
 
 
 def main():
@@ -31,6 +36,8 @@ def main():
 
     deps = check_deps(args)
 
+    # The stages run one after another so that a failure stops the
+    # installation immediately, the builds themselves use all cores.
     if 'rust' in deps:
         install_core(args)
 
@@ -41,6 +48,8 @@ def main():
     if 'python' in deps:
         install_python(args)
 
+    remove_stale_files(args)
+
     need_cmd(
         'aardwolf',
         f'Command `aardwolf` is not executable, you may want to add {args.destination} to your PATH',
@@ -48,7 +57,7 @@ def main():
 
 
 def indent():
-    return ''.join(['  ' for _ in range(LOG_INDENT)])
+    return LOG_INDENTS[LOG_INDENT]
 
 
 def inc_indent():
@@ -112,12 +121,35 @@ def run_cmd(cmd, args=None, cwd=None):
         exit(1)
 
 
+def install_file(args, source, destination):
+    args.installed.add(os.path.basename(destination))
+
+    # Skip files identical to the installed ones. The content is compared, the
+    # installed copy may come from a different build mode with any mtime.
+    if os.path.isfile(destination) and filecmp.cmp(source, destination, shallow=False):
+        return
+
+    shutil.copy(source, destination)
+
+
 def prepare_dest(args):
     if os.path.isdir(args.destination):
         info(f'Aardwolf already installed at "{args.destination}", upgrading')
-        shutil.rmtree(args.destination)
 
-    os.makedirs(args.destination)
+    # Keep the existing installation, only changed files are overwritten. The
+    # files which are not part of the new installation are removed at the end.
+    os.makedirs(args.destination, exist_ok=True)
+    args.installed = set()
+
+
+def remove_stale_files(args):
+    with os.scandir(args.destination) as entries:
+        for entry in entries:
+            if entry.name not in args.installed:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
 
 
 def check_deps(args):
@@ -126,19 +158,17 @@ def check_deps(args):
     PYTHON_MAJOR = 3
     PYTHON_MINOR = 8
 
-    semver_pattern = re.compile(r'(\d+)\.(\d+)\.(\d+)')
     satisfied = set()
 
     info('Checking dependencies')
 
     if need_cmd(['rustc', 'cargo'], 'Rust not found, Aardwolf core cannot be installed'):
-        rust_version = run_cmd('rustc', ['--version'])
-        rust_version_match = semver_pattern.search(rust_version)
+        rust_version = parse_semver(run_cmd('rustc', ['--version']))
 
-        if rust_version_match is None:
+        if rust_version is None:
             error('Retrieving LLVM version failed')
 
-        rust_minor = int(rust_version_match.group(2))
+        rust_minor = rust_version[1]
 
         if rust_minor >= RUST_MINOR:
             info('Rust dependency satisfied')
@@ -153,13 +183,12 @@ def check_deps(args):
                 error('Aardwolf core cannot be installed')
 
     if need_cmd('llvm-config', 'LLVM not found, LLVM frontend will not be installed', level='warn'):
-        llvm_version = run_cmd('llvm-config', ['--version'])
-        llvm_version_match = semver_pattern.search(llvm_version)
+        llvm_version = parse_semver(run_cmd('llvm-config', ['--version']))
 
-        if llvm_version_match is None:
+        if llvm_version is None:
             error('Retrieving LLVM version failed')
 
-        llvm_major = int(llvm_version_match.group(1))
+        llvm_major = llvm_version[0]
 
         if llvm_major >= LLVM_MAJOR:
             info('LLVM dependency satisfied')
@@ -174,14 +203,13 @@ def check_deps(args):
                 error('LLVM frontend will not be installed')
 
     if need_cmd(['python3', 'pip3'], 'Python not found, Python frontend will not be installed', level='warn'):
-        python_version = run_cmd('python3', ['--version'])
-        python_version_match = semver_pattern.search(python_version)
+        python_version = parse_semver(run_cmd('python3', ['--version']))
 
-        if python_version_match is None:
+        if python_version is None:
             error('Retrieving Python version failed')
 
-        python_major = int(python_version_match.group(1))
-        python_minor = int(python_version_match.group(2))
+        python_major = python_version[0]
+        python_minor = python_version[1]
 
         if python_major >= PYTHON_MAJOR and python_minor >= PYTHON_MINOR:
             info('Python dependency satisfied')
@@ -195,29 +223,58 @@ def check_deps(args):
             else:
                 error('Python frontend will not be installed')
 
+    # Check the build tools and resolve their paths once, the installation
+    # stages then use them directly.
+    if 'llvm' in satisfied:
+        need_cmd('cmake')
+
+    if 'python' in satisfied:
+        need_cmd('poetry')
+
+    args.cargo = shutil.which('cargo')
+    args.cmake = shutil.which('cmake')
+    args.poetry = shutil.which('poetry')
+    args.pip3 = shutil.which('pip3')
+
     return satisfied
 
 
+def parse_semver(version):
+    # Find the first token in the form of major.minor.patch, the patch part may
+    # be followed by a suffix (e.g., 10.0.0git).
+    for token in version.split():
+        parts = token.split('.', 2)
+
+        if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+            patch = parts[2]
+            end = 0
+            while end < len(patch) and patch[end].isdigit():
+                end += 1
+
+            if end > 0:
+                return int(parts[0]), int(parts[1]), int(patch[:end])
+
+    return None
+
+
 def install_core(args):
     info('Installing Aardwolf core')
     inc_indent()
 
-    need_cmd(['cargo'])
-
     mode = 'release' if not args.debug else 'debug'
 
-    source_dir = os.path.join(ROOT_DIR, 'core')
+    source_dir = CORE_DIR
     build_dir = os.path.join(source_dir, 'target', mode)
 
     info('Compile')
     cmd_args = ['build']
     if not args.debug:
         cmd_args.append('--release')
-    run_cmd('cargo', cmd_args, cwd=source_dir)
+    run_cmd(args.cargo, cmd_args, cwd=source_dir)
 
     info('Install')
-    shutil.copy(os.path.join(build_dir, 'aardwolf'),
-                os.path.join(args.destination, 'aardwolf'))
+    install_file(args, os.path.join(build_dir, 'aardwolf'),
+                 os.path.join(args.destination, 'aardwolf'))
 
     dec_indent()
     info('Aardwolf core was successfully installed')
@@ -227,25 +284,22 @@ def install_llvm(args):
     info('Installing LLVM frontend')
     inc_indent()
 
-    need_cmd(['cmake', 'make'])
-
     mode_dir = 'release' if not args.debug else 'debug'
     mode = 'Release' if not args.debug else 'Debug'
 
-    source_dir = os.path.join(ROOT_DIR, 'frontends', 'llvm')
+    source_dir = LLVM_DIR
     build_dir = os.path.join(source_dir, 'build', mode_dir)
 
     info('Compile')
     os.makedirs(build_dir, exist_ok=True)
 
-    run_cmd('cmake', [f'-DCMAKE_BUILD_TYPE={mode}', source_dir], cwd=build_dir)
-    run_cmd('make', cwd=build_dir)
+    build_cmake(args, source_dir, build_dir, mode)
 
     info('Install')
-    shutil.copy(os.path.join(build_dir, 'lib', 'libAardwolfLLVM.so'),
-                os.path.join(args.destination, 'libAardwolfLLVM.so'))
-    shutil.copy(os.path.join(build_dir, 'bin', 'aardwolf_llvm'),
-                os.path.join(args.destination, 'aardwolf_llvm'))
+    install_file(args, os.path.join(build_dir, 'lib', 'libAardwolfLLVM.so'),
+                 os.path.join(args.destination, 'libAardwolfLLVM.so'))
+    install_file(args, os.path.join(build_dir, 'bin', 'aardwolf_llvm'),
+                 os.path.join(args.destination, 'aardwolf_llvm'))
 
     dec_indent()
     info('LLVM frontend was successfully installed')
@@ -255,50 +309,61 @@ def install_runtime(args):
     info('Installing C runtime')
     inc_indent()
 
-    need_cmd(['cmake', 'make'])
-
     mode_dir = 'release' if not args.debug else 'debug'
     mode = 'Release' if not args.debug else 'Debug'
 
-    source_dir = os.path.join(ROOT_DIR, 'runtime')
+    source_dir = RUNTIME_DIR
     build_dir = os.path.join(source_dir, 'build', mode_dir)
 
     info('Compile')
     os.makedirs(build_dir, exist_ok=True)
 
-    run_cmd('cmake', [f'-DCMAKE_BUILD_TYPE={mode}', source_dir], cwd=build_dir)
-    run_cmd('make', cwd=build_dir)
+    build_cmake(args, source_dir, build_dir, mode)
 
     info('Install')
-    shutil.copy(os.path.join(build_dir, 'aardwolf_external'),
-                os.path.join(args.destination, 'aardwolf_external'))
-
-    libfiles = chain(*[glob.glob(os.path.join(build_dir, f'*.{ext}'))
-                       for ext in ['so', 'a']])
-
-    for libfile in libfiles:
-        libfile = os.path.basename(libfile)
+    install_file(args, os.path.join(build_dir, 'aardwolf_external'),
+                 os.path.join(args.destination, 'aardwolf_external'))
 
-        shutil.copy(os.path.join(build_dir, libfile),
-                    os.path.join(args.destination, libfile))
+    # Single pass over the build directory for both shared and static
+    # libraries.
+    with os.scandir(build_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(('.so', '.a')):
+                install_file(args, entry.path,
+                             os.path.join(args.destination, entry.name))
 
     dec_indent()
     info('C runtime was successfully installed')
 
 
+def build_cmake(args, source_dir, build_dir, mode):
+    cmake_args = [f'-DCMAKE_BUILD_TYPE={mode}', source_dir]
+
+    # Prefer Ninja if available, but keep the generator of an already
+    # configured build directory since CMake refuses to change it.
+    configured = os.path.isfile(os.path.join(build_dir, 'CMakeCache.txt'))
+    if not configured:
+        if shutil.which('ninja') is not None:
+            cmake_args = ['-G', 'Ninja'] + cmake_args
+        else:
+            need_cmd('make')
+
+    run_cmd(args.cmake, cmake_args, cwd=build_dir)
+    run_cmd(args.cmake, ['--build', '.', '--parallel',
+                         str(os.cpu_count() or 1)], cwd=build_dir)
+
+
 def install_python(args):
     info('Installing Python frontend')
     inc_indent()
 
-    need_cmd(['poetry', 'pip3'])
-
     now = time.time()
 
-    source_dir = os.path.join(ROOT_DIR, 'frontends', 'python')
+    source_dir = PYTHON_DIR
     build_dir = os.path.join(source_dir, 'dist')
 
-    def _remove_aardwolf_tools_dev_dependency(fh):
-        return ''.join(filter(lambda line: not line.startswith('aardwolf_tools'), fh.readlines()))
+    def _remove_aardwolf_tools_dev_dependency(lines):
+        return (line for line in lines if not line.startswith('aardwolf_tools'))
 
     # Remove aardwolf_tools development (!) dependency from the pyproject in
     # order to be able to successfully build the package using poetry. This
@@ -309,13 +374,15 @@ def install_python(args):
         os.path.join(source_dir, 'pyproject.toml'),
         _remove_aardwolf_tools_dev_dependency)
 
-    info('Compile')
-    run_cmd('poetry', ['build'], cwd=source_dir)
-
-    info('Install')
-    install_python_package(args, build_dir, now)
+    try:
+        info('Compile')
+        run_cmd(args.poetry, ['build'], cwd=source_dir)
 
-    pyproject_toml.restore()
+        info('Install')
+        install_python_package(args, build_dir, now)
+    finally:
+        # Restore the original even when the build fails (run_cmd exits).
+        pyproject_toml.restore()
 
     dec_indent()
     info('Python frontend was successfully installed')
@@ -327,15 +394,15 @@ def install_python_package(args, dist_dir, modified_time):
 
         if modified > modified_time:
             filename = os.path.basename(filename)
-            shutil.copy(os.path.join(dist_dir, filename),
-                        os.path.join(args.destination, filename))
+            install_file(args, os.path.join(dist_dir, filename),
+                         os.path.join(args.destination, filename))
 
             # By default, Python frontend assumes usage in a virtual
             # environment, so it does not install itself system-wide. This
             # can be overrode by --system-python flag.
             if args.system_python:
-                run_cmd('pip3', ['install', '--user',
-                                 os.path.join(args.destination, filename)])
+                run_cmd(args.pip3, ['install', '--user',
+                                    os.path.join(args.destination, filename)])
 
 
 class TemporaryChange:
@@ -344,19 +411,26 @@ class TemporaryChange:
         self.original_ = original
 
     def restore(self):
-        shutil.move(self.backup_, self.original_)
+        os.replace(self.backup_, self.original_)
 
 
 def change_file_temporarily(filename, change):
     backup = filename + '.bak'
 
-    shutil.copy2(filename, backup)
+    # The original file is replaced (not rewritten in place) below, so a hard
+    # link is enough to keep its content.
+    try:
+        os.link(filename, backup)
+    except OSError:
+        shutil.copy2(filename, backup)
 
-    with open(filename) as fh:
-        changed = change(fh)
+    # Stream the changed lines into a temporary file which then replaces the
+    # original one.
+    changed = filename + '.tmp'
+    with open(filename) as input_fh, open(changed, 'w') as output_fh:
+        output_fh.writelines(change(input_fh))
 
-    with open(filename, 'w') as fh:
-        fh.write(changed)
+    os.replace(changed, filename)
 
     return TemporaryChange(backup, filename)
 
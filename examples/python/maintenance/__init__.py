@@ -1,74 +1,114 @@
 __version__ = '0.1.0'
 
-from datetime import datetime
+from datetime import date
+from itertools import compress
 
+# Formatted timestamps of the current day, keyed by (format, day).
+_date_cache = {}
 
-class Task:
-    def __init__(self, name, priority):
-        self.name = name
-        self.priority_ = priority
+
+def _today(fmt):
+    today = date.today()
+    key = (fmt, today)
+
+    formatted = _date_cache.get(key)
+    if formatted is None:
+        # Drop the timestamps of previous days.
+        if any(cached_day != today for _, cached_day in _date_cache):
+            _date_cache.clear()
+
+        formatted = today.strftime(fmt)
+        _date_cache[key] = formatted
+
+    return formatted
 
 
 class Entity:
     def __init__(self, id, standard, priority_threshold, tasks_threshold, waiting_threshold):
         self.id = id
         self.standard_ = standard
+
+        # Resolve the name and timestamp formats of the standard once.
+        if standard == 'A':
+            self.format_ = ('A_{name}_{timestamp}', '%y%m%d')
+        elif standard == 'B':
+            self.format_ = ('B{name}{timestamp}', '%Y%m%d')
+        else:
+            raise ValueError(f'Unknown standard: {standard}')
+
         self.priority_threshold = priority_threshold
         self.tasks_threshold = tasks_threshold
         self.waiting_threshold = waiting_threshold
 
-        self.tasks_ = []
+        # Tasks are stored as parallel lists of names and priorities.
+        self.names_ = []
+        self.priorities_ = []
         self.waiting_ = 0
 
+        # Maintained incrementally so that `should_process` does not need to
+        # scan all the tasks.
+        self.zero_count_ = 0
+        self.below_threshold_count_ = 0
+
     def add_task(self, name, priority):
-        if self.standard_ == 'A':
-            timestamp = datetime.now().strftime('%y%m%d')
-            standardized = f'A_{name}_{timestamp}'
-        elif self.standard_ == 'B':
-            timestamp = datetime.now().strftime('%Y%m%d')
-            standardized = f'B{name}{timestamp}'
+        name_format, timestamp_format = self.format_
+        standardized = name_format.format(
+            name=name, timestamp=_today(timestamp_format))
 
-        self.tasks_.append(Task(standardized, priority))
+        self.names_.append(standardized)
+        self.priorities_.append(priority)
+        self._count_priority(priority)
 
     def decrease_priorities(self):
-        for task in self.tasks_:
-            task.priority_ -= 1
+        self.zero_count_ = 0
+        self.below_threshold_count_ = 0
+
+        # Decrease and recount in a single pass over the priorities.
+        priorities = self.priorities_
+        for index, priority in enumerate(priorities):
+            priority -= 1
+            priorities[index] = priority
+            self._count_priority(priority)
+
+    def _count_priority(self, priority):
+        if priority == 0:
+            self.zero_count_ += 1
+
+        if priority < self.priority_threshold:
+            self.below_threshold_count_ += 1
 
     def wait(self):
         self.waiting_ += 1
 
     def should_process(self):
-        counter = 0
-
         if self.waiting_ >= self.waiting_threshold:
             return True
 
-        for task in self.tasks_:
-            if task.priority_ == 0:
-                return True
-            elif task.priority_ < self.priority_threshold:
-                counter += 1
+        if self.zero_count_ > 0:
+            return True
 
-        return counter >= self.tasks_threshold
+        return self.below_threshold_count_ >= self.tasks_threshold
 
     def prioritized_tasks(self):
         if self.waiting_ >= self.waiting_threshold:
             self.waiting_ = 0
-            return self.tasks_
+            return self.names_
         else:
-            return filter(lambda task: task.priority_ < self.priority_threshold, self.tasks_)
+            mask = [priority < self.priority_threshold for priority in self.priorities_]
+            return list(compress(self.names_, mask))
 
 
-def process(entities):
-    tasks = []
-
-    for entity in entities:
-        if entity.should_process():
-            tasks.extend([(entity.id, task.name)
-                          for task in entity.prioritized_tasks()])
+    def tick(self):
+        if self.should_process():
+            names = self.prioritized_tasks()
         else:
-            entity.wait()
+            self.wait()
+            names = []
+
+        self.decrease_priorities()
 
-        entity.decrease_priorities()
+        return names
 
-    return tasks
+
+def process(entities):
+    return [(entity.id, name) for entity in entities for name in entity.tick()]
@@ -17,14 +17,6 @@ def make_standardized(standard, name):
         raise Exception('Unknown standard')
 
 
-def is_deep_equal(actual, expected, message):
-    result = len(actual) == len(expected)
-    for actual_task, expected_task in zip(actual, expected):
-        result = result and (actual_task == expected_task)
-
-    return result
-
-
 def test_tasks_threshold():
     e1 = Entity(1, 'A', 3, 2, 10)
     e2 = Entity(2, 'A', 3, 2, 10)
@@ -36,7 +28,7 @@ def test_tasks_threshold():
 
     expected = [(1, make_standardized('A', 'e1t1')),
                 (1, make_standardized('A', 'e1t2'))]
-    assert is_deep_equal(process([e1, e2]), expected, 'T1')
+    assert process([e1, e2]) == expected, 'T1'
 
 
 def test_standard_names():
@@ -48,7 +40,7 @@ def test_standard_names():
 
     expected = [(1, make_standardized('A', 'e1t1')),
                 (2, make_standardized('B', 'e2t1'))]
-    assert is_deep_equal(process([e1, e2]), expected, 'T2')
+    assert process([e1, e2]) == expected, 'T2'
 
 
 def test_waiting_threshold():
@@ -59,10 +51,10 @@ def test_waiting_threshold():
     e2.add_task('e2t1', 10)
 
     expected = [(1, make_standardized('A', 'e1t1'))]
-    assert is_deep_equal(process([e1, e2]), [], 'T3')
-    assert is_deep_equal(process([e1, e2]), [], 'T3')
-    assert is_deep_equal(process([e1, e2]), [], 'T3')
-    assert is_deep_equal(process([e1, e2]), expected, 'T3')
+    assert process([e1, e2]) == [], 'T3'
+    assert process([e1, e2]) == [], 'T3'
+    assert process([e1, e2]) == [], 'T3'
+    assert process([e1, e2]) == expected, 'T3'
 
 
 def test_critical_tasks():
@@ -73,8 +65,8 @@ def test_critical_tasks():
     e2.add_task('e2t1', 2)
 
     expected = [(1, make_standardized('A', 'e1t1'))]
-    assert is_deep_equal(process([e1, e2]), [], 'T4')
-    assert is_deep_equal(process([e1, e2]), expected, 'T4')
+    assert process([e1, e2]) == [], 'T4'
+    assert process([e1, e2]) == expected, 'T4'
 
 
 aardwolf.wrap_module(starts_with='test_')
@@ -4,7 +4,7 @@ def get_range(values):
     for x in values:
         if x < min:
             min = x
-        if x > max:
+        elif x > max:
             max = x
 
     return min, max
@@ -23,9 +23,11 @@ def scale_minmax(values):
     if min == max:
         min = 0
 
+    span = max - min
+
     scaled = []
     for x in values:
-        y = safe_div(x - min, max - min)
+        y = safe_div(x - min, span)
         scaled.append(y)
 
     return scaled
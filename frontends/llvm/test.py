@@ -1,7 +1,8 @@
 import sys
 import os
-import subprocess
+import shutil
 import tempfile
+import asyncio
 
 # Add aardwolf_tools path to sys.path as a temporary "dependency resolution
 # solution".
@@ -38,22 +39,53 @@ def extract_opt_level(filename):
         return '-O0'
 
 
-def process(filename):
-    tmpdir = tempfile.gettempdir()
+async def process(filename, semaphore):
+    # Every job has its own output directory so that concurrent jobs and
+    # concurrent runs (e.g. from different checkouts) do not clash.
+    tmpdir = tempfile.mkdtemp(prefix='aardwolf-llvm-')
 
-    obj_file = change_ext(filename, '.o')
-    opt_level = extract_opt_level(filename)
-    clang = f'clang -Xclang -load -Xclang {frontend} -c -g {opt_level} -o {obj_file} {filename}'
-    subprocess.run(clang, shell=True, cwd=tmpdir, check=True)
+    try:
+        obj_file = os.path.join(tmpdir, change_ext(os.path.basename(filename), '.o'))
+        outfile = os.path.join(tmpdir, os.path.basename(filename)) + '.aard'
 
-    outfile = os.path.join(tmpdir, os.path.basename(filename)) + '.aard'
+        opt_level = extract_opt_level(filename)
 
-    parsed = aardwolf_tools.parse_file(outfile)
+        async with semaphore:
+            clang = await asyncio.create_subprocess_exec(
+                'clang', '-Xclang', '-load', '-Xclang', frontend,
+                '-c', '-g', opt_level, '-o', obj_file, filename, cwd=tmpdir)
+            returncode = await clang.wait()
+
+        if returncode != 0:
+            # Report the test as failed instead of aborting the whole run, the
+            # message is shown as the actual output.
+            return f'compilation failed: clang exited with code {returncode}'
+
+        parsed = aardwolf_tools.parse_file(outfile)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
 
     return parsed
 
 
-aardwolf_tools.run_driver(
-    test_files=aardwolf_tools.find_tests(tests, '.c'),
-    process_source=process,
-    annotations_prefix='// ')
+async def process_all(test_files):
+    # Each test file is compiled by an independent clang process, so run as
+    # many of them as there are cores while the finished ones are parsed.
+    semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+    return await asyncio.gather(*[process(filename, semaphore) for filename in test_files])
+
+
+if __name__ == '__main__':
+    test_files = aardwolf_tools.find_tests(tests, '.c')
+
+    # Skipped tests are not processed by the driver, so they are not compiled
+    # at all.
+    active_files = [filename for filename in test_files
+                    if aardwolf_tools.extract_annotations(filename, '// ') is not None]
+
+    processed = dict(zip(active_files, asyncio.run(process_all(active_files))))
+
+    aardwolf_tools.run_driver(
+        test_files=test_files,
+        process_source=processed.get,
+        annotations_prefix='// ')
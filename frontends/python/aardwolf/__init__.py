@@ -3,7 +3,7 @@ from .analysis import Analysis
 from .static_data import StaticData
 from .dynamic_data import Instrumenter
 from .pipeline import process_str, process_file
-from .runtime import write_stmt, write_expr, write_external, write_test_status, write_value, aardwolf_iter
+from .runtime import write_stmt, write_expr, write_external, write_test_status, write_value, write_values, aardwolf_iter
 from .hooks import install
 from .test_drivers import wrap_test, wrap_module
 from .utils import use_aardwolf
@@ -22,6 +22,7 @@ __all__ = [
     'write_external',
     'write_test_status',
     'write_value',
+    'write_values',
     'aardwolf_iter',
     'install',
     'wrap_test',
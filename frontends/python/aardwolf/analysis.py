@@ -1,9 +1,10 @@
 import ast
 import os
+import sys
 
 from .cfg import CFGBuilder
 from .values import ValueAccessBuilder
-from .utils import IdMap
+from .utils import IdMap, make_dispatch
 
 
 class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
@@ -20,103 +21,113 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
         except:
             self.file_id_ = 0
 
+        self.dispatch_ = make_dispatch(type(self))
+
+    def visit(self, node):
+        visitor = self.dispatch_.get(type(node))
+        if visitor is None:
+            return self.generic_visit(node)
+
+        return visitor(self, node)
+
+    def generic_visit(self, node):
+        visit = self.visit
+        # Read the fields directly, ast.iter_fields is a generator which
+        # wraps each lookup in try/except.
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        visit(item)
+            elif isinstance(value, ast.AST):
+                visit(value)
+
     def visit_ClassDef(self, node):
         self.push_ctx(node.name)
         self.enter_scope(node.name)
 
-        self._visit_body(node.decorator_list)
-        if any([isinstance(decorator, ast.Call) for decorator in node.decorator_list]):
+        has_call = False
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+            has_call = has_call or isinstance(decorator, ast.Call)
+
+        if has_call:
             # Break the decorators initialization from the body of the function.
             self.new_block()
 
-        self._visit_body(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
 
         self.pop_ctx()
         self.exit_scope()
 
     def visit_FunctionDef(self, node):
-        name = f'{node.name}[{node.lineno}]'
+        name = sys.intern(f'{node.name}[{node.lineno}]')
 
         self.push_ctx(name)
         self.enter_scope(name)
 
-        self._visit_body(node.decorator_list)
-        if any([isinstance(decorator, ast.Call) for decorator in node.decorator_list]):
+        has_call = False
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+            has_call = has_call or isinstance(decorator, ast.Call)
+
+        if has_call:
             # Break the decorators initialization from the body of the function.
             self.new_block()
 
-        self.new_level()
         for arg in node.args.args:
-            self.register_name(arg)
-            self.add_def(arg, self.access())
+            self.add_def(arg, self.name_access(arg))
             self.add_node(arg)
 
-        self.collect_level()
-
-        self._visit_body(node.args.defaults)
+        for default in node.args.defaults:
+            self.visit(default)
 
-        self._visit_body(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
 
         self.pop_ctx()
         self.exit_scope()
 
     def visit_Assign(self, node):
-        self.new_level()
-        self.visit(node.value)
-        self.add_uses(node, self.collect_level())
+        self.add_uses(node, self._visit_collect(node.value))
 
         for target in node.targets:
-            self.new_level()
-            self.visit(target)
-            self.add_defs(node, self.collect_level())
+            self.add_defs(node, self._visit_collect(target))
 
         self.add_node(node)
 
     def visit_AugAssign(self, node):
-        self.new_level()
-        self.visit(node.value)
-        self.add_uses(node, self.collect_level())
+        self.add_uses(node, self._visit_collect(node.value))
 
-        self.new_level()
-        self.visit(node.target)
-        defs = self.collect_level()
+        defs = self._visit_collect(node.target)
         self.add_defs(node, defs)
         self.add_uses(node, defs)
 
         self.add_node(node)
 
     def visit_Assert(self, node):
-        self.new_level()
-        self.generic_visit(node)
-        self.add_uses(node, self.collect_level())
+        self.add_uses(node, self._visit_collect(node.test, node.msg))
 
         self.add_node(node)
 
     def visit_Delete(self, node):
         for target in node.targets:
-            self.new_level()
-            self.visit(target)
-            self.add_uses(node, self.collect_level())
+            self.add_uses(node, self._visit_collect(target))
 
         self.add_node(node)
 
     def visit_Call(self, node):
-        self.new_level()
-
-        for arg in node.args:
-            self.visit(arg)
-
-        for keyword in node.keywords:
-            self.visit(keyword.value)
-
-        self.add_uses(node, self.collect_level())
+        keywords = [keyword.value for keyword in node.keywords]
+        self.add_uses(node, self._visit_collect(*node.args, *keywords))
 
         levels = self.levels()
         self.visit(node.func)
 
         if not self.was_registered(levels):
             assert isinstance(node.func, ast.Lambda)
-            name = f'lambda:{node.func.lineno}:{node.func.col_offset}'
+            name = sys.intern(f'lambda:{node.func.lineno}:{node.func.col_offset}')
             self.register_name(name)
 
         self.register_call(node)
@@ -126,9 +137,7 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
         self.add_node(node)
 
     def visit_If(self, node):
-        self.new_level()
-        self.visit(node.test)
-        self.add_uses(node, self.collect_level())
+        self.add_uses(node, self._visit_collect(node.test))
 
         if_block = self.block()
         self.add_node(node)
@@ -136,14 +145,16 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
         then_block = self.new_block()
         if_block.add_succ(then_block)
 
-        self._visit_body(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
         then_block = self.block()
 
         if len(node.orelse) > 0:
             else_block = self.new_block()
             if_block.add_succ(else_block)
 
-            self._visit_body(node.orelse)
+            for stmt in node.orelse:
+                self.visit(stmt)
             else_block = self.block()
         else:
             else_block = None
@@ -157,9 +168,7 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
             else_block.add_succ(new_block)
 
     def visit_For(self, node):
-        self.new_level()
-        self.visit(node.iter)
-        self.add_uses(node, self.collect_level())
+        self.add_uses(node, self._visit_collect(node.iter))
 
         prev_block = self.block()
 
@@ -170,21 +179,21 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
 
         self.add_node(node)
 
-        self.new_level()
-        self.visit(node.target)
-        self.add_defs(node, self.collect_level())
+        self.add_defs(node, self._visit_collect(node.target))
 
         body_block = self.new_block()
         loop_block.add_succ(body_block)
 
-        self._visit_body(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
         self.block().add_succ(loop_block)
 
         if len(node.orelse) > 0:
             else_block = self.new_block()
             loop_block.add_succ(else_block)
 
-            self._visit_body(node.orelse)
+            for stmt in node.orelse:
+                self.visit(stmt)
             else_block = self.block()
         else:
             else_block = None
@@ -201,9 +210,7 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
         self.pop_loop()
 
     def visit_While(self, node):
-        self.new_level()
-        self.visit(node.test)
-        self.add_uses(node, self.collect_level())
+        self.add_uses(node, self._visit_collect(node.test))
 
         prev_block = self.block()
 
@@ -216,14 +223,16 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
         body_block = self.new_block()
         loop_block.add_succ(body_block)
 
-        self._visit_body(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
         self.block().add_succ(loop_block)
 
         if len(node.orelse) > 0:
             else_block = self.new_block()
             loop_block.add_succ(else_block)
 
-            self._visit_body(node.orelse)
+            for stmt in node.orelse:
+                self.visit(stmt)
             else_block = self.block()
         else:
             else_block = None
@@ -259,64 +268,56 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
 
     def visit_With(self, node):
         for item in node.items:
-            self.new_level()
-            self.visit(item.context_expr)
-            self.add_uses(item, self.collect_level())
+            self.add_uses(item, self._visit_collect(item.context_expr))
 
             if item.optional_vars is not None:
-                self.new_level()
-                self.visit(item.optional_vars)
-                self.add_defs(item, self.collect_level())
+                self.add_defs(item, self._visit_collect(item.optional_vars))
 
             self.add_node(item)
 
-        self._visit_body(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
 
     def visit_Lambda(self, node):
-        name = f'lambda:{node.lineno}:{node.col_offset}'
+        name = sys.intern(f'lambda:{node.lineno}:{node.col_offset}')
         self.push_ctx(name)
         self.enter_scope(name)
 
-        self.new_level()
         for arg in node.args.args:
-            self.register_name(arg)
-            self.add_def(arg, self.access())
+            self.add_def(arg, self.name_access(arg))
             self.add_node(arg)
 
-        self.collect_level()
-
-        self._visit_body(node.args.defaults)
+        for default in node.args.defaults:
+            self.visit(default)
 
+        # The body is recorded as a return statement. Only the wrapper needs
+        # a location, the body already has one.
         body = ast.Return(value=node.body)
         ast.copy_location(body, node.body)
-        ast.fix_missing_locations(body)
-        self.visit(body)
+
+        self.add_uses(body, self._visit_collect(node.body))
+        self.add_node(body)
+        self.block().freeze()
 
         self.pop_ctx()
         self.exit_scope()
 
     def visit_Return(self, node):
         if node.value is not None:
-            self.new_level()
-            self.visit(node.value)
-            self.add_uses(node, self.collect_level())
+            self.add_uses(node, self._visit_collect(node.value))
 
         self.add_node(node)
         self.block().freeze()
 
     def visit_Yield(self, node):
         if node.value is not None:
-            self.new_level()
-            self.visit(node.value)
-            self.add_uses(node, self.collect_level())
+            self.add_uses(node, self._visit_collect(node.value))
 
         self.add_node(node)
 
     def visit_YieldFrom(self, node):
         if node.value is not None:
-            self.new_level()
-            self.visit(node.value)
-            self.add_uses(node, self.collect_level())
+            self.add_uses(node, self._visit_collect(node.value))
 
         self.add_node(node)
 
@@ -338,9 +339,7 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
         self.visit(node.value)
 
         # if isinstance(node.slice, ast.Index):
-        self.new_level()
-        self.visit(node.slice)
-        index = self.collect_level()
+        index = self._visit_collect(node.slice)
 
         if not self.was_registered(levels):
             # Probably constant node.value. Use a dummy base.
@@ -348,6 +347,15 @@ class Analysis(ast.NodeVisitor, CFGBuilder, ValueAccessBuilder):
 
         self.register_subscript(index)
 
-    def _visit_body(self, body):
-        for node in body:
-            self.visit(node)
+    def _visit_collect(self, *nodes):
+        # Visit the nodes with a fresh list of registered accesses and return
+        # it, the accesses of the enclosing expression are kept aside.
+        level = self.level_
+        self.level_ = collected = []
+
+        for node in nodes:
+            if node is not None:
+                self.visit(node)
+
+        self.level_ = level
+        return collected
@@ -1,47 +1,58 @@
-from collections import OrderedDict
-
-
 class Block:
+    __slots__ = ('id_', 'body_', 'succ_', 'pred_', 'exits_', 'frozen_')
+
     def __init__(self, id):
         self.id_ = id
-        self.body_ = []
-        self.succ_ = []
-        self.pred_ = []
-        self.exits_ = []
+        # Lists are allocated lazily, many blocks stay empty and are removed
+        # during normalization.
+        self.body_ = None
+        self.succ_ = None
+        self.pred_ = None
+        self.exits_ = None
         self.frozen_ = False
 
     def add_node(self, node):
+        if self.body_ is None:
+            self.body_ = []
         self.body_.append(node)
 
     def add_succ(self, block, force=False):
         assert isinstance(block, Block)
         if not self.frozen_ or force:
+            if self.succ_ is None:
+                self.succ_ = []
             self.succ_.append(block)
+
+            if block.pred_ is None:
+                block.pred_ = []
             block.pred_.append(self)
 
     def add_exit(self, block):
         assert isinstance(block, Block)
         if not self.frozen_:
+            if self.exits_ is None:
+                self.exits_ = []
             self.exits_.append(block)
 
     def freeze(self):
         self.frozen_ = True
 
     def normalize(self):
-        if len(self.body_) == 0:
-            for pred in self.pred_:
-                for succ in self.succ_:
-                    pred.add_succ(succ, force=True)
-
-                    try:
-                        pred.succ_.remove(self)
-                    except:
-                        pass
+        if self.body_ is None or len(self.body_) == 0:
+            if self.pred_ and self.succ_:
+                # Connect the predecessors directly to the successors and
+                # unlink this empty block, in one pass over each edge list.
+                for pred in self.pred_:
+                    for succ in self.succ_:
+                        pred.add_succ(succ, force=True)
+
+                for pred in self.pred_:
+                    pred.succ_ = [block for block in pred.succ_
+                                  if block is not self]
 
-                    try:
-                        succ.pred_.remove(self)
-                    except:
-                        pass
+                for succ in self.succ_:
+                    succ.pred_ = [block for block in succ.pred_
+                                  if block is not self]
 
             return False
         else:
@@ -54,36 +65,30 @@ class Block:
         return self.body_[-1]
 
     def succ(self):
-        return iter(self.succ_)
+        return iter(self.succ_ or ())
 
     def pred(self):
-        return iter(self.pred_)
+        return iter(self.pred_ or ())
 
     def exits(self):
-        return iter(self.exits_)
+        return iter(self.exits_ or ())
 
     def __str__(self):
         output = f'block{self.id_}:\n'
 
-        for node in self.body_:
+        for node in self:
             output += f'    {node}\n'
 
         output += '  -> ' + \
-            ', '.join([f'block{block.id_}' for block in self.succ_]) + '\n'
+            ', '.join([f'block{block.id_}' for block in self.succ()]) + '\n'
 
         return output
 
     def __iter__(self):
-        return iter(self.body_)
+        return iter(self.body_ or ())
 
     def __len__(self):
-        return len(self.body_)
-
-    def __hash__(self):
-        return hash(self.id_)
-
-    def __eq__(self, other):
-        return self.id_ == other.id_
+        return len(self.body_) if self.body_ is not None else 0
 
 
 class CFGBuilder:
@@ -92,20 +97,26 @@ class CFGBuilder:
         self.block_ = None
 
         self.ctx_stack_ = []
-        self.ctx_store_ = OrderedDict()
+        self.ctx_store_ = dict()
         self.push_ctx('__main__')
 
         self.loops_ = []
 
     def push_ctx(self, name):
-        self.ctx_stack_.append(name)
-        self.ctx_ = self._get_prefix()
+        # The stack holds full prefixes so that they are extended incrementally
+        # instead of joining the whole stack on every push and pop.
+        if len(self.ctx_stack_) > 1:
+            self.ctx_ = self.ctx_stack_[-1] + '::' + name
+        else:
+            self.ctx_ = name
+
+        self.ctx_stack_.append(self.ctx_)
         self.ctx_store_[self.ctx_] = []
         return self.new_block()
 
     def pop_ctx(self):
         self.ctx_stack_.pop()
-        self.ctx_ = self._get_prefix()
+        self.ctx_ = self.ctx_stack_[-1]
         self.block_ = self.ctx_store_[self.ctx_][-1]
         return self.block_
 
@@ -129,6 +140,3 @@ class CFGBuilder:
 
     def block(self):
         return self.block_
-
-    def _get_prefix(self):
-        return self.ctx_stack_[0] if len(self.ctx_stack_) == 1 else '::'.join(self.ctx_stack_[1:])
@@ -1,19 +1,95 @@
 import ast
 
+from .utils import make_dispatch
+
+# Expression contexts are stateless, one instance is shared by all generated
+# nodes.
+LOAD = ast.Load()
+
+# Runtime functions used by the instrumented code. They are imported directly
+# under aliases so the instrumented code does not need to look them up as
+# attributes of the aardwolf module on every call.
+RUNTIME_FUNCTIONS = ['write_stmt', 'write_expr', 'write_value', 'write_values',
+                     'aardwolf_iter']
+RUNTIME_ALIASES = dict([(name, f'_aardwolf_{name}')
+                        for name in RUNTIME_FUNCTIONS])
+
+# Node types which are never rewritten and have no children that could be,
+# the rewrite does not descend into them at all.
+LEAF_NODES = frozenset([ast.Constant, ast.Name, ast.Load, ast.Store, ast.Del,
+                        ast.Pass, ast.Global, ast.Nonlocal, ast.alias])
+
 
 class Instrumenter(ast.NodeTransformer):
     def __init__(self, analysis):
         self.analysis_ = analysis
+        self.file_id_ = ast.Constant(value=analysis.file_id_, kind=None)
+        # Statements are instrumented at several places, their id tuples are
+        # constant and shared as well. Keyed by the statement node itself, so
+        # repeated lookups do not go through the analysis id map.
+        self.node_ids_ = dict()
+        self.dispatch_ = make_dispatch(type(self))
+
+    def visit(self, node):
+        visitor = self.dispatch_.get(type(node))
+        if visitor is None:
+            return self.generic_visit(node)
+
+        return visitor(self, node)
+
+    def generic_visit(self, node):
+        # Same semantics as ast.NodeTransformer.generic_visit, but leaves are
+        # skipped and fields are only reassigned if some child was replaced.
+        visit = self.visit
+        for field in node._fields:
+            old_value = getattr(node, field, None)
+            if isinstance(old_value, list):
+                new_values = None
+                for index, value in enumerate(old_value):
+                    if isinstance(value, ast.AST) and type(value) not in LEAF_NODES:
+                        new_value = visit(value)
+                        if new_value is not value:
+                            if new_values is None:
+                                new_values = old_value[:index]
+
+                            if new_value is None:
+                                pass
+                            elif isinstance(new_value, ast.AST):
+                                new_values.append(new_value)
+                            else:
+                                new_values.extend(new_value)
+
+                            continue
+
+                    if new_values is not None:
+                        new_values.append(value)
+
+                if new_values is not None:
+                    old_value[:] = new_values
+            elif isinstance(old_value, ast.AST) and type(old_value) not in LEAF_NODES:
+                new_node = visit(old_value)
+                if new_node is None:
+                    delattr(node, field)
+                elif new_node is not old_value:
+                    setattr(node, field, new_node)
+
+        return node
 
     def visit_Module(self, node):
         self.generic_visit(node)
 
-        import_aardwolf = ast.Import(
-            names=[ast.alias(name='aardwolf', asname=None)])
-        ast.fix_missing_locations(import_aardwolf)
+        import_aardwolf = ast.ImportFrom(
+            module='aardwolf',
+            names=[ast.alias(name=name, asname=alias)
+                   for name, alias in RUNTIME_ALIASES.items()],
+            level=0)
 
         node.body.insert(0, import_aardwolf)
 
+        # The instrumentation only sets the location of the outermost
+        # generated nodes, fill in the rest in a single pass over the module.
+        ast.fix_missing_locations(node)
+
         return node
 
     def visit_FunctionDef(self, node):
@@ -33,14 +109,27 @@ class Instrumenter(ast.NodeTransformer):
 
         node.value = self._instrument_expr(node.value, node)
 
-        for target in node.targets:
+        if len(node.targets) == 1:
             builder = TargetAccessorBuilder()
-            builder.visit(target)
+            builder.visit(node.targets[0])
             accessors = builder.build()
 
-            # Wrap the value with the tracing call as many times as the number
-            # of targets to match the number of definitions.
             node.value = self._instrument_trace_value(node.value, accessors)
+        else:
+            # Trace the value once for each target to match the number of
+            # definitions, but in a single runtime call.
+            trees = []
+            for target in node.targets:
+                builder = TargetAccessorBuilder()
+                builder.visit(target)
+                trees.append(builder.build().value)
+
+            accessors = ast.Constant(value=tuple(trees), kind=None)
+            call = self._make_runtime_call(
+                'write_values', [node.value, accessors])
+            ast.copy_location(call, node.value)
+
+            node.value = call
 
         return node
 
@@ -58,6 +147,9 @@ class Instrumenter(ast.NodeTransformer):
 
     def visit_Assert(self, node):
         self.generic_visit(node)
+
+        # Even a constant test stays wrapped. A separate statement record would
+        # be kept when asserts are removed by `python -O`, unlike the assert.
         return self._instrument_term_expr(node, 'test')
 
     def visit_Delete(self, node):
@@ -70,12 +162,17 @@ class Instrumenter(ast.NodeTransformer):
         # foo(bar) -> write_expr(foo)(bar)
         node_id = self._make_node_id(node)
         node.func = self._make_runtime_call('write_expr', [node.func, node_id])
-        ast.fix_missing_locations(node)
 
         return self._instrument_trace_value(node)
 
     def visit_If(self, node):
         self.generic_visit(node)
+
+        if isinstance(node.test, ast.Constant):
+            # The test is known statically, record the statement on its own
+            # and keep the test constant so the compiler can fold it.
+            return self._instrument_term(node)
+
         node.test = self._instrument_expr(node.test, node)
         return node
 
@@ -91,7 +188,6 @@ class Instrumenter(ast.NodeTransformer):
         call = self._make_runtime_call(
             'aardwolf_iter', [node.iter, stmt_id, accessors])
         ast.copy_location(call, node.iter)
-        ast.fix_missing_locations(call)
 
         node.iter = call
 
@@ -99,6 +195,16 @@ class Instrumenter(ast.NodeTransformer):
 
     def visit_While(self, node):
         self.generic_visit(node)
+
+        if isinstance(node.test, ast.Constant):
+            if node.test.value:
+                # The test is evaluated before each iteration and always
+                # passes, record it at the start of the body instead.
+                node.body.insert(0, self._make_write_stmt(node))
+                return node
+            else:
+                return self._instrument_term(node)
+
         node.test = self._instrument_expr(node.test, node)
         return node
 
@@ -134,16 +240,27 @@ class Instrumenter(ast.NodeTransformer):
         return self._instrument_term_expr(node, 'value')
 
     def _make_node_id(self, node):
-        file_id = ast.Constant(value=self.analysis_.file_id_, kind=None)
-        stmt_id, changed = self.analysis_.nodes_.get_checked(node)
-        assert not changed, 'instrumentation must not create new statement indexes'
+        node_id = self.node_ids_.get(node)
+        if node_id is not None:
+            return node_id
+
+        try:
+            stmt_id = self.analysis_.nodes_[node]
+        except KeyError:
+            raise AssertionError(
+                'instrumentation must not create new statement indexes')
+
         stmt_id = ast.Constant(value=stmt_id, kind=None)
+        node_id = ast.Tuple(elts=[self.file_id_, stmt_id], ctx=LOAD)
+        self.node_ids_[node] = node_id
 
-        return ast.Tuple(elts=[file_id, stmt_id], ctx=ast.Load())
+        return node_id
 
     def _make_runtime_call(self, name, args):
-        func = ast.Attribute(value=ast.Name(
-            id='aardwolf', ctx=ast.Load()), attr=name, ctx=ast.Load())
+        # Every call needs its own name node. A shared node would get the
+        # location of the first call site, which would then be reported for
+        # all the others.
+        func = ast.Name(id=RUNTIME_ALIASES[name], ctx=LOAD)
         call = ast.Call(func=func, args=args, keywords=[])
         return call
 
@@ -156,7 +273,6 @@ class Instrumenter(ast.NodeTransformer):
         stmt = ast.Expr(value=call)
 
         ast.copy_location(stmt, node)
-        ast.fix_missing_locations(stmt)
 
         return stmt
 
@@ -176,7 +292,6 @@ class Instrumenter(ast.NodeTransformer):
         call = self._make_runtime_call('write_expr', [node, node_id])
 
         ast.copy_location(call, node)
-        ast.fix_missing_locations(call)
 
         return call
 
@@ -189,7 +304,6 @@ class Instrumenter(ast.NodeTransformer):
             'write_expr', [getattr(node, expr_field), node_id])
 
         ast.copy_location(call, node)
-        ast.fix_missing_locations(call)
 
         setattr(node, expr_field, call)
 
@@ -202,56 +316,49 @@ class Instrumenter(ast.NodeTransformer):
         call = self._make_runtime_call('write_value', [node, accessors])
 
         ast.copy_location(call, node)
-        ast.fix_missing_locations(call)
 
         return call
 
     def _make_trace_arg(self, arg):
-        node = ast.Name(id=arg.arg, ctx=ast.Load())
+        node = ast.Name(id=arg.arg, ctx=LOAD)
         call = self._make_runtime_call('write_value', [node])
         stmt = ast.Expr(value=call)
 
         ast.copy_location(stmt, arg)
-        ast.fix_missing_locations(stmt)
 
         return stmt
 
 
-# For unpacking assignment.
+# For unpacking assignment. The accessor tree is built from tuples and emitted
+# as a single constant, so it is not constructed again on every execution.
+# Starred targets are marked by None.
 class TargetAccessorBuilder(ast.NodeVisitor):
     def __init__(self):
-        self.tree_ = []
+        self.dispatch_ = make_dispatch(type(self))
+        self.tree_ = ()
+
+    def visit(self, node):
+        visitor = self.dispatch_.get(type(node))
+        if visitor is None:
+            return self.generic_visit(node)
+
+        return visitor(self, node)
 
     def build(self):
-        tree = self._build_node(self.tree_)
-        ast.fix_missing_locations(tree)
-        return tree
+        return ast.Constant(value=self.tree_, kind=None)
 
     def visit_Tuple(self, node):
         assert isinstance(node.ctx, ast.Store)
-
-        tree = self.tree_
-        for elt in node.elts:
-            self.tree_ = []
-            self.visit(elt)
-            tree.append(self.tree_)
-        self.tree_ = tree
+        self._visit_elts(node.elts)
 
     def visit_List(self, node):
         assert isinstance(node.ctx, ast.Store)
-
-        tree = self.tree_
-        for elt in node.elts:
-            self.tree_ = []
-            self.visit(elt)
-            tree.append(self.tree_)
-        self.tree_ = tree
+        self._visit_elts(node.elts)
 
     def visit_Starred(self, node):
         assert isinstance(node.ctx, ast.Store)
-        self.visit(node.value)
-        # Our indication that it is starred, quite hacky tbh.
-        self.tree_ = tuple(self.tree_)
+        # The starred values are not traced, the nested targets do not matter.
+        self.tree_ = None
 
     def visit_Name(self, node):
         assert isinstance(node.ctx, ast.Store)
@@ -265,11 +372,11 @@ class TargetAccessorBuilder(ast.NodeVisitor):
         assert isinstance(node.ctx, ast.Store)
         # Stop the visitor here
 
-    def _build_node(self, value):
-        assert isinstance(value, (list, tuple))
-        elts = [self._build_node(elem) for elem in value]
+    def _visit_elts(self, elts):
+        children = []
+        for elt in elts:
+            self.tree_ = ()
+            self.visit(elt)
+            children.append(self.tree_)
 
-        if isinstance(value, list):
-            return ast.List(elts=elts, ctx=ast.Load())
-        else:
-            return ast.Tuple(elts=elts, ctx=ast.Load())
+        self.tree_ = tuple(children)
@@ -7,7 +7,7 @@ from importlib.abc import Loader, MetaPathFinder
 from importlib.util import spec_from_file_location, find_spec
 from importlib.machinery import SourceFileLoader
 
-from .pipeline import process_file
+from .pipeline import process_file_cached
 from .utils import use_aardwolf
 
 
@@ -20,13 +20,14 @@ class AardwolfMetaFinder(MetaPathFinder):
             ignore = []
 
         self.ignore_ = ignore
+        self.listings_ = dict()
 
     def find_spec(self, fullname, path, target=None):
         split = fullname.split('.')
 
         for ignore in self.ignore_:
             # This guarantees that also submodules are ignored
-            if all([lhs == rhs for lhs, rhs in zip(split, ignore.split('.'))]):
+            if all(lhs == rhs for lhs, rhs in zip(split, ignore.split('.'))):
                 return None
 
         # If the requested module comes from the user package to be analysed and
@@ -42,18 +43,26 @@ class AardwolfMetaFinder(MetaPathFinder):
             name = split[-1]
 
             for entry in path:
-                if os.path.isdir(os.path.join(entry, name)):
+                listing = self._list_dir(entry)
+
+                dir_entry = listing.get(name)
+                if dir_entry is not None and dir_entry.is_dir():
                     # Directory module with child modules.
                     filename = os.path.join(entry, name, "__init__.py")
                     submodule_locations = [os.path.join(entry, name)]
+
+                    # Check if the source file actually exists.
+                    if not os.path.isfile(filename):
+                        continue
                 else:
                     # Assume file module.
                     filename = os.path.join(entry, name + '.py')
                     submodule_locations = None
 
-                # Check if the source file actually exists.
-                if not os.path.isfile(filename):
-                    continue
+                    # Check if the source file actually exists.
+                    dir_entry = listing.get(name + '.py')
+                    if dir_entry is None or not dir_entry.is_file():
+                        continue
 
                 return spec_from_file_location(
                     fullname,
@@ -67,6 +76,34 @@ class AardwolfMetaFinder(MetaPathFinder):
             # Use default machinery.
             return None
 
+    def invalidate_caches(self):
+        # Called by `importlib.invalidate_caches`, e.g., when a module is
+        # written within the mtime granularity of the cached listing.
+        self.listings_.clear()
+
+    def _list_dir(self, entry):
+        # Similarly to CPython FileFinder, keep the directory listing and only
+        # refresh it when the directory changes. The entries cache the file
+        # type, so probing them does not need further syscalls.
+        try:
+            mtime = os.stat(entry).st_mtime_ns
+        except OSError:
+            return dict()
+
+        cached = self.listings_.get(entry)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with os.scandir(entry) as entries:
+                listing = dict([(dir_entry.name, dir_entry)
+                                for dir_entry in entries])
+        except OSError:
+            listing = dict()
+
+        self.listings_[entry] = (mtime, listing)
+        return listing
+
 
 class AardwolfLoader(Loader):
     def __init__(self, filename, outdir=None):
@@ -80,7 +117,7 @@ class AardwolfLoader(Loader):
         return None  # use default module creation semantics
 
     def exec_module(self, module):
-        code = process_file(self.filename_, self.outdir_)
+        code = process_file_cached(self.filename_, self.outdir_)
         exec(code, vars(module))
 
 
@@ -1,8 +1,32 @@
 import ast
-from copy import copy
+
+from .utils import make_dispatch
+
+# Fields which hold lists of statements (or of nodes holding statements).
+STMT_FIELDS = ['body', 'orelse', 'finalbody', 'handlers', 'cases']
 
 
 class Normalizer(ast.NodeTransformer):
+    def __init__(self):
+        self.dispatch_ = make_dispatch(type(self))
+
+    def visit(self, node):
+        visitor = self.dispatch_.get(type(node))
+        if visitor is None:
+            return self.generic_visit(node)
+
+        return visitor(self, node)
+
+    def generic_visit(self, node):
+        # Function definitions can appear only among statements, so only the
+        # statement lists are traversed and expressions are skipped entirely.
+        # The nodes are modified in place.
+        for field in STMT_FIELDS:
+            for child in getattr(node, field, []):
+                self.visit(child)
+
+        return node
+
     def visit_FunctionDef(self, node):
         self.generic_visit(node)
 
@@ -20,8 +44,6 @@ class Normalizer(ast.NodeTransformer):
 
             node.body.append(ret_none)
 
-            return copy(node)
-
         return node
 
     # TODO: ModuleDef, append some kind of no-operation at the and of the module
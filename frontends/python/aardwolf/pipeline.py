@@ -1,10 +1,13 @@
 import ast
+import hashlib
+import marshal
 import os
+import sys
 
 from .normalization import Normalizer
 from .symbols import symbol_table
 from .analysis import Analysis
-from .static_data import StaticData
+from .static_data import StaticData, output_path
 from .dynamic_data import Instrumenter
 from .constants import DATA_DEST
 
@@ -51,5 +54,93 @@ def process_str(source, outdir=None, filename='<string>', mode='exec'):
 
 
 def process_file(filename, outdir=None, mode='exec'):
-    with open(filename) as fh:
+    # Read the source as bytes, the parser detects the encoding itself and
+    # the source is not decoded twice.
+    with open(filename, 'rb') as fh:
         return process_str(fh.read(), outdir, filename, mode)
+
+
+def process_file_cached(filename, outdir=None):
+    # Same as `process_file`, but the instrumented code together with the
+    # static data is cached in __pycache__ next to the source, similarly to
+    # CPython bytecode cache. The cache is invalidated when the source or the
+    # frontend itself changes.
+    if outdir is None:
+        outdir = os.getcwd()
+
+    with open(filename, 'rb') as fh:
+        source = fh.read()
+
+    key = _cache_key(filename, source)
+    cache = os.path.join(os.path.dirname(filename), '__pycache__',
+                         f'{os.path.basename(filename)}.aard-{sys.implementation.cache_tag}.pyc')
+    static = output_path(filename, outdir)
+
+    try:
+        with open(cache, 'rb') as fh:
+            cached_key, code, static_data = marshal.load(fh)
+    except (OSError, EOFError, ValueError, TypeError):
+        cached_key = None
+
+    if cached_key == key:
+        # Set up the environment the same way as `_process` does.
+        os.makedirs(outdir, exist_ok=True)
+        os.environ[DATA_DEST] = outdir
+
+        os.makedirs(os.path.dirname(static), exist_ok=True)
+        with open(static, 'wb') as fh:
+            fh.write(static_data)
+
+        return code
+
+    code = process_str(source, outdir, filename)
+
+    # Writing the cache is disabled the same way as writing the bytecode.
+    # Failing to write it is not an error, e.g., the source directory can be
+    # read-only, the next run is just a cache miss again.
+    if sys.dont_write_bytecode:
+        return code
+
+    tmp = f'{cache}.{os.getpid()}.tmp'
+    try:
+        with open(static, 'rb') as fh:
+            static_data = fh.read()
+
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with open(tmp, 'wb') as fh:
+            marshal.dump((key, code, static_data), fh)
+        os.replace(tmp, cache)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+    return code
+
+
+FRONTEND_FINGERPRINT = None
+
+
+def _cache_key(filename, source):
+    global FRONTEND_FINGERPRINT
+    if FRONTEND_FINGERPRINT is None:
+        # Any modification of the frontend may change the instrumentation.
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.realpath(__file__))
+        for name in sorted(os.listdir(package)):
+            if name.endswith('.py'):
+                mtime = os.stat(os.path.join(package, name)).st_mtime_ns
+                digest.update(f'{name}:{mtime};'.encode('utf8'))
+        FRONTEND_FINGERPRINT = digest.digest()
+
+    # The inode number is embedded in the instrumented code as the file id.
+    try:
+        file_id = os.stat(filename).st_ino
+    except:
+        file_id = 0
+
+    digest = hashlib.sha256(FRONTEND_FINGERPRINT)
+    digest.update(f'{os.path.realpath(filename)}:{file_id};'.encode('utf8'))
+    digest.update(source)
+    return digest.hexdigest()
@@ -1,6 +1,7 @@
 import os
 import sys
 import copy
+import struct
 
 from .writer import Writer
 from .constants import *
@@ -8,13 +9,39 @@ from .constants import *
 WRITER = None
 TEST_RESULTS = None
 
-
-def _init_if_needed():
+# Statement record (token, file id, statement id) packed at once. Native byte
+# order without padding, the same as writing the fields one by one.
+STMT_RECORD = struct.Struct('=BQQ')
+
+# Value records (token, value), packed the same way.
+BOOL_RECORD = struct.Struct('=BB')
+I64_RECORD = struct.Struct('=Bq')
+UNSUPPORTED_RECORD = bytes([TOKEN_DATA_UNSUPPORTED])
+
+I64_MIN = -(1 << 63)
+I64_MAX = (1 << 63) - 1
+
+# The float representation does not change at runtime, detect it once.
+if sys.float_info.max == 1.7976931348623157e+308:
+    FLOAT_TOKEN = TOKEN_DATA_F64
+    FLOAT_RECORD = struct.Struct('=Bd')
+elif sys.float_info.max == 3.4028235e+38:
+    FLOAT_TOKEN = TOKEN_DATA_F32
+    FLOAT_RECORD = struct.Struct('=Bf')
+else:
+    # Something ridiculous is happening
+    FLOAT_TOKEN = TOKEN_DATA_UNSUPPORTED
+    FLOAT_RECORD = None
+
+
+# The writer is created lazily because the data destination may be set only
+# after the runtime is imported. The `WRITER is None` check is done by the
+# callers so the common path does not pay for a function call.
+def _init_writer():
     global WRITER
-    if WRITER is None:
-        WRITER = Writer(os.path.join(os.environ.get(
-            DATA_DEST, os.getcwd()), 'aard.trace'))
-        WRITER.write_str('AARD/D1')
+    WRITER = Writer(os.path.join(os.environ.get(
+        DATA_DEST, os.getcwd()), 'aard.trace'))
+    WRITER.write_str('AARD/D1')
 
 
 def _init_test_results_if_needed():
@@ -25,69 +52,118 @@ def _init_test_results_if_needed():
 
 
 def write_stmt(id):
-    _init_if_needed()
-    WRITER.write_token(TOKEN_STATEMENT)
-    WRITER.write_u64(id[0])
-    WRITER.write_u64(id[1])
+    if WRITER is None:
+        _init_writer()
+    WRITER.write_raw(STMT_RECORD.pack(TOKEN_STATEMENT, id[0], id[1]))
 
 
 def write_expr(result, id):
-    _init_if_needed()
-    write_stmt(id)
+    # Same as write_stmt, inlined to save a call for every traced expression.
+    if WRITER is None:
+        _init_writer()
+    WRITER.write_raw(STMT_RECORD.pack(TOKEN_STATEMENT, id[0], id[1]))
     return result
 
 
-# Accessor tree is in "S-expression" form. Examples:
-# a = foo -> write_value(value, [])
-# a, b = foo -> write_value(value, [[], []])
-# a, (b, c) = foo -> write_value(value, [[], [[], []]])
+def _pack_bool(v):
+    return BOOL_RECORD.pack(TOKEN_DATA_BOOL, int(v))
+
+
+def _pack_int(v):
+    # We consider all int values to be of type i64 because we have no
+    # information of their actual type. Using `bit_length` may cause
+    # unnecessary type changes in the runtime. Integers have unlimited
+    # precision, if the v does not fit into 8 bytes, it is unsupported by
+    # Aardwolf.
+    if I64_MIN <= v <= I64_MAX:
+        return I64_RECORD.pack(TOKEN_DATA_I64, v)
+    else:
+        return UNSUPPORTED_RECORD
+
+
+def _pack_float(v):
+    return FLOAT_RECORD.pack(FLOAT_TOKEN, v)
+
+
+def _pack_unsupported(v):
+    return UNSUPPORTED_RECORD
+
+
+if FLOAT_RECORD is None:
+    # The float representation is unknown, decided once for all values.
+    _pack_float = _pack_unsupported
+
+
+# Exact types only, subclasses are resolved by `_value_packer`.
+VALUE_PACKERS = {bool: _pack_bool, int: _pack_int, float: _pack_float}
+
+
+def _value_packer(v):
+    if isinstance(v, bool):
+        # This check needs to be *before* int check because bool is a subtype of
+        # int.
+        return _pack_bool
+    elif isinstance(v, int):
+        return _pack_int
+    elif isinstance(v, float):
+        return _pack_float
+
+    # Not yet supported by the core:
+    # elif v is None:
+    #     WRITER.write_token(TOKEN_DATA_NULL)
+
+    # else:
+    #     WRITER.write_token(TOKEN_DATA_NAMED)
+    #     WRITER.write_cstr(type(v).__name__)
+
+    else:
+        return _pack_unsupported
+
+
+# Accessor tree is in "S-expression" form of constant tuples, starred targets
+# are None. Examples:
+# a = foo -> write_value(value, ())
+# a, b = foo -> write_value(value, ((), ()))
+# a, (b, c) = foo -> write_value(value, ((), ((), ())))
+# a, *b = foo -> write_value(value, ((), None))
 def write_value(value, accessor_tree=None):
-    _init_if_needed()
-
-    if accessor_tree is None:
-        accessor_tree = []
-
-    for v in unpack_values(value, accessor_tree):
-        if isinstance(v, bool):
-            # This check needs to be *before* int check because bool is a subtype of
-            # int.
-            WRITER.write_token(TOKEN_DATA_BOOL)
-            WRITER.write_u8(int(v))
-
-        elif isinstance(v, int):
-            # We consider all int values to be of type i64 because we have no
-            # information of their actual type. Using `bit_length` may cause
-            # unnecessary type changes in the runtime. Integers have unlimited
-            # precision, if the v does not fit into 8 bytes, it is unsupported
-            # by Aardwolf.
-            try:
-                _ = v.to_bytes(8, byteorder=sys.byteorder)
-                WRITER.write_token(TOKEN_DATA_I64)
-                WRITER.write_i64(v)
-            except OverflowError:
-                WRITER.write_token(TOKEN_DATA_UNSUPPORTED)
-
-        elif isinstance(v, float):
-            if sys.float_info.max == 1.7976931348623157e+308:
-                WRITER.write_token(TOKEN_DATA_F64)
-                WRITER.write_f64(v)
-            elif sys.float_info.max == 3.4028235e+38:
-                WRITER.write_token(TOKEN_DATA_F32)
-                WRITER.write_f32(v)
-            else:
-                # Something ridiculous is happening
-                WRITER.write_token(TOKEN_DATA_UNSUPPORTED)
+    if WRITER is None:
+        _init_writer()
 
-        # Not yet supported by the core:
-        # elif v is None:
-        #     WRITER.write_token(TOKEN_DATA_NULL)
+    if accessor_tree is None or len(accessor_tree) == 0:
+        # No unpacking, which is the common case.
+        values = (value,)
+    else:
+        values = unpack_values(value, accessor_tree)
+
+    for v in values:
+        pack = VALUE_PACKERS.get(type(v))
+        if pack is None:
+            pack = _value_packer(v)
 
-        # else:
-        #     WRITER.write_token(TOKEN_DATA_NAMED)
-        #     WRITER.write_cstr(type(v).__name__)
+        WRITER.write_raw(pack(v))
 
+    return value
+
+
+# Chained assignment, the value is traced for each accessor tree in order.
+# a = b = foo -> write_values(value, ((), ()))
+def write_values(value, accessor_trees):
+    if WRITER is None:
+        _init_writer()
+
+    for accessor_tree in accessor_trees:
+        if len(accessor_tree) == 0:
+            values = (value,)
         else:
-            WRITER.write_token(TOKEN_DATA_UNSUPPORTED)
+            values = unpack_values(value, accessor_tree)
+
+        for v in values:
+            pack = VALUE_PACKERS.get(type(v))
+            if pack is None:
+                pack = _value_packer(v)
+
+            WRITER.write_raw(pack(v))
 
     return value
 
@@ -98,9 +174,21 @@ class NonSubscriptable:
 
 
 def unpack_values(value, tree):
-    if len(tree) == 0:
-        return [value]
-    else:
+    # Walk the accessor tree depth-first with an explicit stack and yield the
+    # values in the order of the assignment targets.
+    stack = [(value, tree)]
+    while len(stack) > 0:
+        value, tree = stack.pop()
+
+        if tree is None:
+            # *rest unpacking. For now, assume unsupported data type for now.
+            yield None
+            continue
+
+        if len(tree) == 0:
+            yield value
+            continue
+
         # Ensure that we can use value[index].
         if not hasattr(value, '__getitem__'):
             if hasattr(value, '__iter__'):
@@ -115,39 +203,29 @@ def unpack_values(value, tree):
             else:
                 value = NonSubscriptable()
 
-        output = []
-        for index, node in enumerate(tree):
-            if isinstance(node, tuple):
-                # *rest unpacking. For now, assume unsupported data type for now.
-                output.append([None])
-            else:
-                output.extend(unpack_values(value[index], node))
-
-        return output
-
+        # Starred targets are not indexed, their position does not correspond
+        # to a single item.
+        children = [(None if node is None else value[index], node)
+                    for index, node in enumerate(tree)]
+        stack.extend(reversed(children))
 
-def aardwolf_iter(iter, id, accessors=None):
-    return AardwolfIter(iter, id, accessors)
 
+def aardwolf_iter(iterable, id, accessors=None):
+    # Get the iterator eagerly so that errors are raised when the loop starts,
+    # the same as for the original loop.
+    return _aardwolf_iter(iter(iterable), id, accessors)
 
-class AardwolfIter:
-    def __init__(self, inner, id, accessors):
-        self.inner_ = iter(inner)
-        self.id_ = id
-        self.accessors_ = accessors
 
-    def __iter__(self):
-        return self
-
-    def __next__(self):
-        value = next(self.inner_)
-        write_stmt(self.id_)
-        write_value(value, self.accessors_)
-        return value
+def _aardwolf_iter(inner, id, accessors):
+    for value in inner:
+        write_stmt(id)
+        write_value(value, accessors)
+        yield value
 
 
 def write_external(external):
-    _init_if_needed()
+    if WRITER is None:
+        _init_writer()
     WRITER.write_token(TOKEN_EXTERNAL)
     WRITER.write_cstr(external)
 
@@ -1,122 +1,161 @@
 import ast
 import os
 import re
+import struct
 
-from .writer import Writer
+from .writer import Writer, U8, U32, U64
 from .constants import *
-from .utils import unique, Counter
+from .utils import Counter
+
+
+# Statements whose location is given by one of their fields instead of the
+# whole node.
+LOC_FIELDS = {
+    ast.If: 'test',
+    ast.For: 'target',
+    ast.While: 'test',
+    ast.withitem: 'context_expr',
+}
+
+# Statement header (token, file id, statement id) and successor id (file id,
+# statement id) records.
+STMT_RECORD = struct.Struct('=BQQ')
+STMT_ID_RECORD = struct.Struct('=QQ')
+
+# Trailing record (file id, line, column, end line, end column, metadata)
+# packed at once. Native byte order without padding, the same as writing the
+# fields one by one.
+LOC_META_RECORD = struct.Struct('=QIIIIB')
+
+# Single byte counts (successors, defs, uses), packed in advance.
+U8_BYTES = tuple(U8(n) for n in range(256))
+
+METAS = {
+    ast.arg: META_ARG,
+    ast.Return: META_RET,
+    ast.Call: META_CALL,
+}
 
 
 class Stmt:
+    __slots__ = ('node_', 'succ_', 'defs_', 'uses_')
+
     def __init__(self, node, defs, uses):
         self.node_ = node
         self.succ_ = []
-        self.defs_ = unique(defs)
-        self.uses_ = unique(uses)
+        # Already unique, see ValueAccessBuilder.
+        self.defs_ = defs
+        self.uses_ = uses
 
     def add_succ(self, node):
         self.succ_.append(node)
 
     def get_loc(self):
-        if isinstance(self.node_, ast.If):
-            return self._get_loc(self.node_.test)
-        elif isinstance(self.node_, ast.For):
-            return self._get_loc(self.node_.target)
-        elif isinstance(self.node_, ast.While):
-            return self._get_loc(self.node_.test)
-        elif isinstance(self.node_, ast.withitem):
-            return self._get_loc(self.node_.context_expr)
-        else:
+        field = LOC_FIELDS.get(type(self.node_))
+        if field is None:
             return self._get_loc(self.node_)
+        else:
+            return self._get_loc(getattr(self.node_, field))
 
     def _get_loc(self, node):
         return node.lineno, node.col_offset + 1, node.end_lineno, node.end_col_offset + 1
 
     def get_meta(self):
-        if isinstance(self.node_, ast.arg):
-            return META_ARG
-        elif isinstance(self.node_, ast.Return):
-            return META_RET
-        elif isinstance(self.node_, ast.Call):
-            return META_CALL
-        else:
-            return 0
+        return METAS.get(type(self.node_), 0)
 
-    def write(self, analysis, writer):
-        writer.write_token(TOKEN_STATEMENT)
+    def write(self, writer, file_id, node_ids, access_data):
+        # The id lookups are passed in already bound, they are the same for
+        # all statements of the file. The accesses are serialized by
+        # `access_data`.
+        write_raw = writer.write_raw
 
         # Statement id
-        self._write_stmt_id(analysis, writer, self.node_)
+        write_raw(STMT_RECORD.pack(TOKEN_STATEMENT, file_id, node_ids(self.node_)))
 
         # Successors
-        writer.write_u8(len(self.succ_))
-        for succ in self.succ_:
-            self._write_stmt_id(analysis, writer, succ)
+        write_raw(U8_BYTES[len(self.succ_)])
+        if self.succ_:
+            for succ in self.succ_:
+                write_raw(STMT_ID_RECORD.pack(file_id, node_ids(succ)))
 
         # Defs
-        writer.write_u8(len(self.defs_))
-        for access in self.defs_:
-            self._write_access(analysis, writer, access)
+        write_raw(U8_BYTES[len(self.defs_)])
+        if self.defs_:
+            for access in self.defs_:
+                write_raw(access_data(access))
 
         # Uses
-        writer.write_u8(len(self.uses_))
-        for access in self.uses_:
-            self._write_access(analysis, writer, access)
-
-        # Location
-        loc = self.get_loc()
-
-        writer.write_u64(analysis.file_id_)
-        writer.write_u32(loc[0])
-        writer.write_u32(loc[1])
-        writer.write_u32(loc[2])
-        writer.write_u32(loc[3])
-
-        # Metadata
-        writer.write_u8(self.get_meta())
-
-    def _write_stmt_id(self, analysis, writer, node):
-        writer.write_u64(analysis.file_id_)
-        writer.write_u64(analysis.nodes_.get(node))
-
-    def _write_access(self, analysis, writer, access):
-        if access.is_scalar():
-            writer.write_token(TOKEN_VALUE_SCALAR)
-            writer.write_u64(analysis.values_.get(access))
+        write_raw(U8_BYTES[len(self.uses_)])
+        if self.uses_:
+            for access in self.uses_:
+                write_raw(access_data(access))
+
+        # Location and metadata
+        line, col, end_line, end_col = self.get_loc()
+        write_raw(LOC_META_RECORD.pack(
+            file_id, line, col, end_line, end_col, self.get_meta()))
+
+
+def pack_access(access, value_ids):
+    # Pre-order traversal with an explicit stack. The number of indices of an
+    # array-like access is written between its base and the indices, it is
+    # pushed on the stack as a plain integer.
+    data = []
+    stack = [access]
+    while len(stack) > 0:
+        access = stack.pop()
+
+        if isinstance(access, int):
+            data.append(U32(access))
+        elif access.is_scalar():
+            data.append(U8(TOKEN_VALUE_SCALAR))
+            data.append(U64(value_ids(access)))
         elif access.is_structural():
-            writer.write_token(TOKEN_VALUE_STRUCTURAL)
-            self._write_access(analysis, writer, access.base_)
-            self._write_access(analysis, writer, access.accessors_)
+            data.append(U8(TOKEN_VALUE_STRUCTURAL))
+            stack.append(access.accessors_)
+            stack.append(access.base_)
         elif access.is_array_like():
-            writer.write_token(TOKEN_VALUE_ARRAY_LIKE)
-            self._write_access(analysis, writer, access.base_)
-            writer.write_u32(len(access.accessors_))
-            for index in access.accessors_:
-                self._write_access(analysis, writer, index)
+            data.append(U8(TOKEN_VALUE_ARRAY_LIKE))
+            stack.extend(reversed(access.accessors_))
+            stack.append(len(access.accessors_))
+            stack.append(access.base_)
+
+    return b''.join(data)
+
+
+def output_path(filename, outdir=None):
+    if outdir is None:
+        outdir = os.getcwd()
+
+    prefix = os.path.commonprefix([os.getcwd() + os.path.sep, filename])
+    output = filename.replace(prefix, '') + '.aard'
+    output = os.path.join(outdir, output)
+    return os.path.realpath(output)
 
 
 class StaticData:
     def __init__(self, analysis):
         self.analysis_ = analysis
         self.functions_ = Counter()
+        # Serialized accesses. The same access is usually used by many
+        # statements (e.g., a loop variable) and its data, including the value
+        # ids, does not change within the file.
+        self.accesses_ = dict()
 
     def write(self, outdir=None):
-        if outdir is None:
-            outdir = os.getcwd()
-
-        prefix = os.path.commonprefix([os.getcwd() + os.path.sep, self.analysis_.filename_])
-        output = self.analysis_.filename_.replace(prefix, '') + '.aard'
-        output = os.path.join(outdir, output)
-        output = os.path.realpath(output)
+        output = output_path(self.analysis_.filename_, outdir)
 
         os.makedirs(os.path.dirname(output), exist_ok=True)
 
         writer = Writer(output)
         writer.write_str('AARD/S1')
 
+        file_id = self.analysis_.file_id_
+        node_ids = self.analysis_.nodes_.get
+
         for func, body in self.analysis_.ctx_store_.items():
             # Empty function
-            if all([len(block) == 0 for block in body]):
+            if all(len(block) == 0 for block in body):
                 continue
 
             func_name = re.sub(r'\[\d+\]', '', func)
@@ -133,7 +172,7 @@ class StaticData:
             stmts = self._get_stmts(body)
 
             for stmt in stmts:
-                stmt.write(self.analysis_, writer)
+                stmt.write(writer, file_id, node_ids, self._access_data)
 
         writer.write_token(TOKEN_FILENAMES)
         writer.write_u32(1)
@@ -141,32 +180,41 @@ class StaticData:
         writer.write_cstr(self.analysis_.filename_)
         writer.close()
 
+    def _access_data(self, access):
+        data = self.accesses_.get(access)
+        if data is None:
+            data = pack_access(access, self.analysis_.values_.get)
+            self.accesses_[access] = data
+
+        return data
+
     def _get_stmts(self, func_body):
         # Normalize the basic blocks first. It properly reconnect the edges of
-        # empty basic blocks.
-        for block in func_body:
-            block.normalize()
+        # empty basic blocks. Only the non-empty blocks have statements.
+        blocks = [block for block in func_body if block.normalize()]
+
+        defs = self.analysis_.defs_
+        uses = self.analysis_.uses_
 
         stmts = []
-        for block in func_body:
+        append = stmts.append
+        for block in blocks:
+            # Blocks are non-empty here. Each statement is linked to the next
+            # one in the block, the last one to the entries of the successors.
             prev = None
             for node in block:
-                defs = self.analysis_.defs_.get(node, [])
-                uses = self.analysis_.uses_.get(node, [])
-
-                stmt = Stmt(node, defs, uses)
-                stmts.append(stmt)
+                stmt = Stmt(node, defs.get(node, ()), uses.get(node, ()))
+                append(stmt)
 
                 if prev is not None:
-                    prev.add_succ(stmt.node_)
+                    prev.add_succ(node)
 
                 prev = stmt
 
-            if prev is not None:
-                for succ in block.succ():
-                    if len(succ) > 0:
-                        prev.add_succ(succ.entry())
-                    else:
-                        assert len(list(succ.succ())) == 0
+            for succ in block.succ():
+                if len(succ) > 0:
+                    prev.add_succ(succ.entry())
+                else:
+                    assert len(list(succ.succ())) == 0
 
         return stmts
@@ -1,10 +1,13 @@
 import ast
+import sys
 
 CTX_ASSIGN = 'assign'
 CTX_DEFINE = 'define'
 
 
 class Symbol:
+    __slots__ = ('name_',)
+
     def __init__(self, name):
         self.name_ = name
 
@@ -16,10 +19,14 @@ class Symbol:
 
 
 class Scope(Symbol):
+    __slots__ = ('parent_', 'children_', 'by_name_')
+
     def __init__(self, name, parent):
         super().__init__(name)
         self.parent_ = parent
         self.children_ = []
+        # Index for lookups, the first symbol of the name is the one found.
+        self.by_name_ = dict()
 
     def define(self, symbol, ctx):
         assert ctx in [CTX_ASSIGN, CTX_DEFINE]
@@ -34,20 +41,24 @@ class Scope(Symbol):
             try:
                 self.lookup(name)
             except KeyError:
-                self.children_.append(symbol)
+                self._add(name, symbol)
         elif ctx == CTX_DEFINE:
-            self.children_.append(symbol)
+            self._add(name, symbol)
+
+    def _add(self, name, symbol):
+        self.children_.append(symbol)
+        self.by_name_.setdefault(name, symbol)
 
     def lookup(self, name):
-        for symbol in self.get_namespace():
-            if symbol.get_name() == name:
+        scope = self
+        while scope is not None:
+            symbol = scope.by_name_.get(name)
+            if symbol is not None:
                 return symbol
 
-        parent = self.get_parent()
-        if parent is None:
-            raise KeyError(name)
-        else:
-            return parent.lookup(name)
+            scope = scope.get_parent()
+
+        raise KeyError(name)
 
     def get_parent(self):
         return self.parent_
@@ -140,7 +151,7 @@ class SymbolTableBuilder(ast.NodeVisitor):
         self.generic_visit(node)
 
     def visit_FunctionDef(self, node):
-        name = f'{node.name}[{node.lineno}]'
+        name = sys.intern(f'{node.name}[{node.lineno}]')
         self.table_.push_scope(name)
 
         self.definer_.visit(node.args)
@@ -149,7 +160,7 @@ class SymbolTableBuilder(ast.NodeVisitor):
         self.table_.pop_scope()
 
     def visit_Lambda(self, node):
-        name = f'lambda:{node.lineno}:{node.col_offset}'
+        name = sys.intern(f'lambda:{node.lineno}:{node.col_offset}')
         self.table_.push_scope(name)
 
         self.definer_.visit(node.args)
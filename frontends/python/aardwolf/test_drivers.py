@@ -1,6 +1,6 @@
 import functools
-import types
 import inspect
+import types
 import re
 import sys
 
@@ -12,38 +12,52 @@ def wrap_test(f):
     if not use_aardwolf():
         return f
 
+    name = f.__name__
+
     @functools.wraps(f)
     def aardwolf_test_wrapper(*args, **kwargs):
-        name = f.__name__
         write_external(name)
 
         try:
             output = f(*args, **kwargs)
             write_test_status(name, True)
             return output
-        except Exception as ex:
+        except Exception:
             write_test_status(name, False)
-            raise ex
+            raise
 
     return aardwolf_test_wrapper
 
 
 def wrap_module(module_name=None, starts_with=None, regex=None, ignore=None):
-    pattern = '.+'
+    # Nothing would be wrapped, `wrap_test` returns the functions as they are.
+    if not use_aardwolf():
+        return
+
+    # The plain prefix filter does not need the regex engine.
     if regex is not None:
-        pattern = regex
+        matches = re.compile(regex).search
     elif starts_with is not None:
-        pattern = f'^{starts_with}.*'
-
-    compiled = re.compile(pattern)
+        def matches(name):
+            return name.startswith(starts_with)
+    else:
+        def matches(name):
+            return len(name) > 0
 
-    if ignore is None:
-        ignore = []
+    ignore = frozenset(ignore or ())
 
     if module_name is None:
-        # Try to get the module by inspecting the stack frame of the caller.
-        frame = inspect.stack()[1]
-        module = inspect.getmodule(frame[0])
+        # Try to get the module from the globals of the caller's frame. Only
+        # the single frame is accessed, not the whole stack.
+        frame = sys._getframe(1)
+        module = sys.modules.get(frame.f_globals.get('__name__'))
+        if module is None:
+            # The globals do not name a loaded module (e.g. `exec` with custom
+            # globals), fall back to the more expensive lookup.
+            module = inspect.getmodule(frame)
+        if module is None:
+            raise ValueError(
+                'Cannot determine the module to wrap, call wrap_module with module_name=__name__')
     else:
         # `wrap_module` can be called with `module_name=__name__` if needed
         # (presumably required only when another level of indirection is used on
@@ -52,13 +66,14 @@ def wrap_module(module_name=None, starts_with=None, regex=None, ignore=None):
 
     # Iterate over members of the module to find functions to wrap. Note that
     # the `wrap_module` function must be called at the *end* of the module so it
-    # is completely loaded and the members are retrieved properly.
-    for name, item in inspect.getmembers(module):
-        is_function = isinstance(item, types.FunctionType)
-        satisfies_filter = name not in ignore and (
-            compiled.search(name) is not None)
-
-        if is_function and satisfies_filter:
-            in_module = item.__module__ == module.__name__
-            if in_module:
-                setattr(module, name, wrap_test(item))
+    # is completely loaded and the members are retrieved properly. The cheap
+    # checks go first, the filter is matched only for functions defined in the
+    # module. The namespace is copied since the wrapped functions are set back
+    # into it.
+    module_name = module.__name__
+    for name, item in list(vars(module).items()):
+        if type(item) is types.FunctionType \
+                and item.__module__ == module_name \
+                and name not in ignore \
+                and matches(name):
+            setattr(module, name, wrap_test(item))
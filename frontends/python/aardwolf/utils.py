@@ -1,9 +1,34 @@
 import os
-from collections import OrderedDict
+import ast
 
 
 def unique(values):
-    return list(OrderedDict.fromkeys(values))
+    # Plain dicts preserve the insertion order.
+    return list(dict.fromkeys(values))
+
+
+DISPATCH_TABLES = dict()
+
+
+def make_dispatch(cls):
+    # Map AST node types directly to the `visit_*` functions of the visitor
+    # class, so dispatching a node does not need to build the method name and
+    # look it up. The table is built once per class and shared by all its
+    # instances, the functions take the visitor as the first argument.
+    try:
+        return DISPATCH_TABLES[cls]
+    except KeyError:
+        pass
+
+    dispatch = dict()
+    for name in dir(cls):
+        if name.startswith('visit_'):
+            node_type = getattr(ast, name[len('visit_'):], None)
+            if isinstance(node_type, type) and issubclass(node_type, ast.AST):
+                dispatch[node_type] = getattr(cls, name)
+
+    DISPATCH_TABLES[cls] = dispatch
+    return dispatch
 
 
 def use_aardwolf():
@@ -14,22 +39,28 @@ def use_aardwolf():
 
 
 class IdMap:
+    __slots__ = ('data_',)
+
     def __init__(self):
         self.data_ = dict()
 
     def get(self, value):
-        if value not in self.data_:
-            self.data_[value] = len(self.data_) + 1
+        # Single lookup for the values which already have an index.
+        index = self.data_.get(value)
+        if index is None:
+            index = len(self.data_) + 1
+            self.data_[value] = index
 
-        return self.data_[value]
+        return index
 
-    def get_checked(self, value):
-        orig_len = len(self.data_)
-        index = self.get(value)
-        return index, len(self.data_) != orig_len
+    def __getitem__(self, value):
+        # Lookup of an existing index only, raises KeyError for unknown values.
+        return self.data_[value]
 
 
 class Counter:
+    __slots__ = ('data_',)
+
     def __init__(self):
         self.data_ = dict()
 
@@ -1,35 +1,66 @@
 import ast
+import weakref
+from collections import defaultdict
 
 from .symbols import Symbol
 
-SCALAR = 'scalar'
-STRUCTURAL = 'structural'
-ARRAY_LIKE = 'array_like'
+# Access types. Small integers are compared faster than strings.
+SCALAR = 0
+STRUCTURAL = 1
+ARRAY_LIKE = 2
+
+
+# Structurally equal accesses are represented by a single object (hash
+# consing), so comparing and hashing them does not need to walk their bases and
+# accessors. The objects are dropped from the table once they are not used.
+INTERNED_ACCESSES = weakref.WeakValueDictionary()
 
 
 class Access:
+    __slots__ = ('type_', 'value_', 'base_', 'accessors_', 'meta_', 'hash_',
+                 'str_', '__weakref__')
+
     def __init__(self, type, value=None, base=None, accessors=None, meta=None):
         self.type_ = type
         self.value_ = value
         self.base_ = base
         self.accessors_ = accessors
         self.meta_ = meta
+        self.hash_ = self._hash()
+        # Computed on demand, accesses do not change after they are created.
+        self.str_ = None
+
+    @staticmethod
+    def _interned(type, value=None, base=None, accessors=None, meta=None):
+        # Values, bases and accessors are either interned accesses or symbols,
+        # both of which compare by identity, or plain strings.
+        if isinstance(accessors, list):
+            key = (type, value, base, tuple(accessors), meta)
+        else:
+            key = (type, value, base, accessors, meta)
+
+        access = INTERNED_ACCESSES.get(key)
+        if access is None:
+            access = Access(type, value, base, accessors, meta)
+            INTERNED_ACCESSES[key] = access
+
+        return access
 
     @staticmethod
     def scalar(value):
         assert isinstance(value, (Symbol, str))
-        return Access(SCALAR, value=value)
+        return Access._interned(SCALAR, value=value)
 
     @staticmethod
     def call(value, line, col):
         assert isinstance(value, Access)
-        return Access(SCALAR, value=value, meta=(line, col))
+        return Access._interned(SCALAR, value=value, meta=(line, col))
 
     @staticmethod
     def structural(base, field):
         assert isinstance(base, Access)
         assert isinstance(field, Access) and field.is_scalar()
-        return Access(STRUCTURAL, base=base, accessors=field)
+        return Access._interned(STRUCTURAL, base=base, accessors=field)
 
     @staticmethod
     def array_like(base, index):
@@ -37,10 +68,9 @@ class Access:
             index = [index]
 
         assert isinstance(base, Access)
-        for i in index:
-            assert isinstance(i, Access)
+        assert all(isinstance(i, Access) for i in index)
 
-        return Access(ARRAY_LIKE, base=base, accessors=index)
+        return Access._interned(ARRAY_LIKE, base=base, accessors=index)
 
     def is_scalar(self):
         return self.type_ == SCALAR
@@ -52,6 +82,12 @@ class Access:
         return self.type_ == ARRAY_LIKE
 
     def __str__(self):
+        if self.str_ is None:
+            self.str_ = self._str()
+
+        return self.str_
+
+    def _str(self):
         if self.type_ == SCALAR:
             if isinstance(self.value_, Symbol):
                 name = self.value_.get_name()
@@ -70,38 +106,33 @@ class Access:
             return f'{self.base_}[{index}]'
 
     def __eq__(self, other):
-        return self.type_ == other.type_ and self.value_ == other.value_ and self.base_ == other.base_ and self.accessors_ == other.accessors_ and self.meta_ == other.meta_
+        # Accesses are interned.
+        return self is other
 
     def __hash__(self):
+        return self.hash_
+
+    def _hash(self):
         if self.is_scalar():
             return hash(self.value_) ^ (hash(self.meta_) << 1)
         elif self.is_structural():
             return hash((self.base_, self.accessors_))
         elif self.is_array_like():
-            h = hash(self.base_)
-            for i, access in enumerate(self.accessors_):
-                h = h ^ (hash(access) << (i + 1))
-            return h
+            return hash((self.base_, tuple(self.accessors_)))
 
 
 class ValueAccessBuilder:
     def __init__(self, symbols):
         self.level_ = []
-        self.levels_ = [self.level_]
         self.symbols_ = symbols
+        # The symbol table does not change during the analysis, so the access
+        # of a name within a scope is resolved only once.
+        self.name_accesses_ = dict()
 
-        self.defs_ = dict()
-        self.uses_ = dict()
-
-    def new_level(self):
-        self.level_ = []
-        self.levels_.append(self.level_)
-        return self.level_
-
-    def collect_level(self):
-        level = self.levels_.pop()
-        self.level_ = self.levels_[-1]
-        return level
+        # Accesses of each node are kept in insertion-ordered dicts used as
+        # sets, so that they are unique without another pass.
+        self.defs_ = defaultdict(dict)
+        self.uses_ = defaultdict(dict)
 
     def access(self):
         return self.level_[-1]
@@ -113,26 +144,29 @@ class ValueAccessBuilder:
         self.symbols_ = self.symbols_.get_parent()
 
     def add_defs(self, node, accesses):
-        assert all([isinstance(access, Access) for access in accesses])
-        if not node in self.defs_:
-            self.defs_[node] = []
-
-        self.defs_[node].extend(accesses)
+        assert all(isinstance(access, Access) for access in accesses)
+        defs = self.defs_[node]
+        for access in accesses:
+            defs[access] = None
 
     def add_def(self, node, access):
-        self.add_defs(node, [access])
+        assert isinstance(access, Access)
+        self.defs_[node][access] = None
 
     def add_uses(self, node, accesses):
-        assert all([isinstance(access, Access) for access in accesses])
-        if not node in self.uses_:
-            self.uses_[node] = []
-
-        self.uses_[node].extend(accesses)
+        assert all(isinstance(access, Access) for access in accesses)
+        uses = self.uses_[node]
+        for access in accesses:
+            uses[access] = None
 
     def add_use(self, node, access):
-        self.add_uses(node, [access])
+        assert isinstance(access, Access)
+        self.uses_[node][access] = None
 
     def register_name(self, node):
+        self.level_.append(self.name_access(node))
+
+    def name_access(self, node):
         if isinstance(node, ast.Name):
             name = node.id
         elif isinstance(node, ast.arg):
@@ -142,12 +176,17 @@ class ValueAccessBuilder:
         else:
             name = None
 
-        try:
-            access = Access.scalar(self.symbols_.lookup(name))
-        except KeyError:
-            access = Access.scalar(name)
+        key = (self.symbols_, name)
+        access = self.name_accesses_.get(key)
+        if access is None:
+            try:
+                access = Access.scalar(self.symbols_.lookup(name))
+            except KeyError:
+                access = Access.scalar(name)
+
+            self.name_accesses_[key] = access
 
-        self.level_.append(access)
+        return access
 
     def register_call(self, node):
         line, col = node.lineno, node.col_offset + 1
@@ -1,8 +1,29 @@
 import struct
 
+# Precompiled formats, the format string does not need to be looked up in the
+# struct cache on every write.
+I8 = struct.Struct('b').pack
+I16 = struct.Struct('h').pack
+I32 = struct.Struct('i').pack
+I64 = struct.Struct('q').pack
+U8 = struct.Struct('B').pack
+U16 = struct.Struct('H').pack
+U32 = struct.Struct('I').pack
+U64 = struct.Struct('Q').pack
+F32 = struct.Struct('f').pack
+F64 = struct.Struct('d').pack
+
+
+# Size of the output buffer. Traces are written in many tiny records, a large
+# buffer keeps the number of system calls low.
+BUFFER_SIZE = 1 << 20
+
+
+# The file is buffered by the io module, every write only packs the value and
+# appends it to the buffer.
 class Writer:
     def __init__(self, filename):
-        self.fh_ = open(filename, 'wb')
+        self.fh_ = open(filename, 'wb', buffering=BUFFER_SIZE)
 
     def close(self):
         self.fh_.close()
@@ -10,8 +31,8 @@ class Writer:
     def flush(self):
         self.fh_.flush()
 
-    def _write_packed(self, formatter, value):
-        self.fh_.write(struct.pack(formatter, value))
+    def write_raw(self, value):
+        self.fh_.write(value)
 
     def write_str(self, value):
         self.fh_.write(value.encode('utf8'))
@@ -20,34 +41,34 @@ class Writer:
         self.write_str(value + '\0')
 
     def write_token(self, value):
-        self.write_u8(value)
+        self.fh_.write(U8(value))
 
     def write_i8(self, value):
-        self._write_packed('b', value)
+        self.fh_.write(I8(value))
 
     def write_i16(self, value):
-        self._write_packed('h', value)
+        self.fh_.write(I16(value))
 
     def write_i32(self, value):
-        self._write_packed('i', value)
+        self.fh_.write(I32(value))
 
     def write_i64(self, value):
-        self._write_packed('q', value)
+        self.fh_.write(I64(value))
 
     def write_u8(self, value):
-        self._write_packed('B', value)
+        self.fh_.write(U8(value))
 
     def write_u16(self, value):
-        self._write_packed('H', value)
+        self.fh_.write(U16(value))
 
     def write_u32(self, value):
-        self._write_packed('I', value)
+        self.fh_.write(U32(value))
 
     def write_u64(self, value):
-        self._write_packed('Q', value)
+        self.fh_.write(U64(value))
 
     def write_f32(self, value):
-        self._write_packed('f', value)
+        self.fh_.write(F32(value))
 
     def write_f64(self, value):
-        self._write_packed('d', value)
+        self.fh_.write(F64(value))
@@ -1,8 +1,6 @@
-import difflib
 import os
-import re
+import shutil
 import sys
-import subprocess
 import tempfile
 import aardwolf_tools
 
@@ -48,6 +46,65 @@ def process_trace(filename):
     return parsed
 
 
+def process_cache(filename):
+    # Process a copy of the file twice and check that the second run, served
+    # from the cache, produces the same static data. Then modify the source and
+    # check that the cache is invalidated.
+    srcdir = tempfile.mkdtemp()
+    outdir = tempfile.mkdtemp()
+
+    # The cache respects the flag, which may be set from the environment.
+    dont_write_bytecode = sys.dont_write_bytecode
+    sys.dont_write_bytecode = False
+
+    try:
+        source = os.path.join(srcdir, os.path.basename(filename))
+        shutil.copyfile(filename, source)
+        outfile = aardwolf.static_data.output_path(source, outdir)
+
+        def run():
+            if os.path.exists(outfile):
+                os.remove(outfile)
+            aardwolf.pipeline.process_file_cached(source, outdir)
+            with open(outfile, 'rb') as fh:
+                return fh.read()
+
+        def cache_files():
+            cachedir = os.path.join(srcdir, '__pycache__')
+            return os.listdir(cachedir) if os.path.isdir(cachedir) else []
+
+        first = run()
+        if not cache_files():
+            return 'cache not written'
+
+        if run() != first:
+            return 'cached static data differ'
+
+        with open(source, 'a') as fh:
+            fh.write('\ncache_invalidated = 1\n')
+
+        aardwolf.process_file(source, outdir)
+        with open(outfile, 'rb') as fh:
+            expected = fh.read()
+
+        if run() != expected or expected == first:
+            return 'cache not invalidated'
+
+        # Cache must not be written if bytecode writing is disabled.
+        shutil.rmtree(os.path.join(srcdir, '__pycache__'))
+        sys.dont_write_bytecode = True
+        run()
+
+        if cache_files():
+            return 'cache written despite sys.dont_write_bytecode'
+
+        return None
+    finally:
+        sys.dont_write_bytecode = dont_write_bytecode
+        shutil.rmtree(srcdir, ignore_errors=True)
+        shutil.rmtree(outdir, ignore_errors=True)
+
+
 root = os.path.realpath(os.path.dirname(__file__))
 analysis = os.path.join(root, 'analysis')
 trace = os.path.join(root, 'trace')
@@ -73,5 +130,19 @@ trace_success = aardwolf_tools.run_driver(
     process_source=process_trace,
     annotations_prefix='# ')
 
-if not analysis_success or not trace_success:
+# Run cache tests
+print()
+print()
+print('>>> CACHE')
+print()
+cache_success = True
+for test_file in aardwolf_tools.find_tests(analysis, '.py', ignore=['__init__.py']):
+    error = process_cache(test_file)
+    if error is None:
+        print(f'PASS: {os.path.basename(test_file)}')
+    else:
+        print(f'FAIL: {os.path.basename(test_file)} ({error})')
+        cache_success = False
+
+if not analysis_success or not trace_success or not cache_success:
     exit(1)
@@ -0,0 +1,45 @@
+def identity(x):
+    return x
+
+identity(-1)
+identity(-(1 << 63))
+identity((1 << 63) - 1)
+identity(-(1 << 63) - 1)
+identity(1 << 63)
+identity(1 << 100)
+
+# AARD: statement: #1:1
+# AARD: statement: #1:7
+# AARD: i64: -1
+# AARD: statement: #1:8
+# AARD: i64: -1
+
+# AARD: statement: #1:2
+# AARD: statement: #1:7
+# AARD: i64: -9223372036854775808
+# AARD: statement: #1:8
+# AARD: i64: -9223372036854775808
+
+# AARD: statement: #1:3
+# AARD: statement: #1:7
+# AARD: i64: 9223372036854775807
+# AARD: statement: #1:8
+# AARD: i64: 9223372036854775807
+
+# AARD: statement: #1:4
+# AARD: statement: #1:7
+# AARD: unsupported data type
+# AARD: statement: #1:8
+# AARD: unsupported data type
+
+# AARD: statement: #1:5
+# AARD: statement: #1:7
+# AARD: unsupported data type
+# AARD: statement: #1:8
+# AARD: unsupported data type
+
+# AARD: statement: #1:6
+# AARD: statement: #1:7
+# AARD: unsupported data type
+# AARD: statement: #1:8
+# AARD: unsupported data type
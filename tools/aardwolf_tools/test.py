@@ -8,57 +8,84 @@ def find_tests(root, extension, ignore=None):
     if ignore is None:
         ignore = []
 
+    # Directory entries carry the file type, so no extra stat is needed.
     tests = []
-    for filename in os.listdir(root):
-        fullpath = os.path.join(root, filename)
-        _, ext = os.path.splitext(filename)
-
-        if os.path.isfile(fullpath) and ext == extension and filename not in ignore:
-            tests.append(fullpath)
+    with os.scandir(root) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.endswith(extension) and name not in ignore and entry.is_file():
+                tests.append(entry.path)
 
     return tests
 
 
 def extract_annotations(filename, annotations_prefix):
     prefix = annotations_prefix + 'AARD: '
+    prefix_len = len(prefix)
+    skip = prefix + 'SKIP'
 
     with open(filename) as fh:
         annotations = []
-        for line in fh.readlines():
+        append = annotations.append
+
+        # The file is streamed line by line, a skipped test is recognized
+        # before its annotation is stored.
+        for line in fh:
             line = line.lstrip()
             if line.startswith(prefix):
-                annotations.append(line[len(prefix):])
+                if line.startswith(skip):
+                    return None
 
-            if line.startswith(annotations_prefix + 'AARD: SKIP'):
-                return None
+                append(line[prefix_len:])
 
         return ''.join(annotations)[:-1]
 
 
+# Patterns used for normalization, compiled once.
+NEWLINES_RE = re.compile(r'\n+')
+FILENAME_RE = re.compile(r'@(\d+) = (.+)')
+STMT_FILE_ID_RE = re.compile(r'statement: #(\d+):\d+')
+STATIC_FILE_ID_RE = re.compile(r'([@#])(\d+)')
+DYNAMIC_FILE_ID_RE = re.compile(r'(#)(\d+)')
+
+
+def _replace_ids(pattern, ids, content):
+    # Replaces all file ids in a single pass, the ids not in the mapping are
+    # kept as they are.
+    return pattern.sub(lambda match: match.group(1) + ids.get(match.group(2), match.group(2)), content)
+
+
 def normalize_data(content):
     # Remove blank lines
-    content = '\n'.join(filter(lambda line: line != '', content.splitlines()))
+    content = NEWLINES_RE.sub('\n', content).strip('\n')
 
-    # Normalize file IDs in static data
-    ids = [(match.group(1), match.group(2))
-           for match in re.finditer(r'@(\d+) = (.+)', content)]
-    for i, (id, filepath) in enumerate(ids):
-        content = re.sub(f'@{id}', f'@{i + 1}', content)
-        content = re.sub(f'#{id}', f'#{i + 1}', content)
-        content = re.sub(os.path.dirname(filepath) + os.path.sep, '', content)
+    # Normalize file IDs in static data. The new ID is given by the position
+    # of the first occurrence.
+    ids = dict()
+    dirnames = []
+    for i, match in enumerate(FILENAME_RE.finditer(content)):
+        ids.setdefault(match.group(1), str(i + 1))
+        dirnames.append(os.path.dirname(match.group(2)) + os.path.sep)
+
+    if len(ids) > 0:
+        content = _replace_ids(STATIC_FILE_ID_RE, ids, content)
+        for dirname in dirnames:
+            content = content.replace(dirname, '')
 
     # Normalize file IDs in dynamic data
-    ids = [match.group(1) for match in re.finditer(r'statement: #(\d+):\d+', content)]
-    for i, id in enumerate(ids):
-        content = re.sub(f'#{id}', f'#{i + 1}', content)
+    ids = dict()
+    for i, match in enumerate(STMT_FILE_ID_RE.finditer(content)):
+        ids.setdefault(match.group(1), str(i + 1))
+
+    if len(ids) > 0:
+        content = _replace_ids(DYNAMIC_FILE_ID_RE, ids, content)
 
     return content
 
 
-def compare(actual, expected):
-    diff = ''.join(difflib.unified_diff(actual.splitlines(True),
+def make_diff(actual, expected):
+    return ''.join(difflib.unified_diff(actual.splitlines(True),
                                         expected.splitlines(True), 'actual.aard', 'expected.aard'))
-    return diff == '', diff
 
 
 def run_driver(test_files, process_source, annotations_prefix):
@@ -79,8 +106,9 @@ def run_driver(test_files, process_source, annotations_prefix):
             print(f'SKIP: {basename}')
         else:
             actual = normalize_data(process_source(filename))
-            equal, diff = compare(actual, expected)
-            if equal:
+            # The diff is computed only when it is displayed, the texts are
+            # equal if and only if their diff is empty.
+            if actual == expected:
                 passed += 1
                 print(f'PASS: {basename}')
             else:
@@ -89,7 +117,7 @@ def run_driver(test_files, process_source, annotations_prefix):
 
                 if display_diff:
                     print()
-                    print(diff)
+                    print(make_diff(actual, expected))
                     print()
 
                 if display_actual:
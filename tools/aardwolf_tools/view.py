@@ -1,4 +1,3 @@
-import sys
 import os
 import struct
 
@@ -34,89 +33,149 @@ TOKEN_DATA_NAMED = b'\x28'
 TOKEN_DATA_NULL = b'\x29'
 
 
-def read_stmt(f):
-    file_id = struct.unpack('Q', f.read(8))[0]
-    stmt_id = struct.unpack('Q', f.read(8))[0]
-    return f'#{file_id}:{stmt_id}'
+# Precompiled formats, the values are written in the native byte order without
+# any padding.
+STMT = struct.Struct('=QQ')
+LOC = struct.Struct('=QIIII')
+I8 = struct.Struct('=b')
+I16 = struct.Struct('=h')
+U16 = struct.Struct('=H')
+I32 = struct.Struct('=i')
+U32 = struct.Struct('=I')
+I64 = struct.Struct('=q')
+U64 = struct.Struct('=Q')
+F32 = struct.Struct('=f')
+F64 = struct.Struct('=d')
 
 
-def read_i8(f):
-    return struct.unpack('b', f.read(1))[0]
+# The readers take the whole data buffer and the offset to read from, and
+# return the value together with the offset following it.
+def read_stmt(buf, off):
+    file_id, stmt_id = STMT.unpack_from(buf, off)
+    return f'#{file_id}:{stmt_id}', off + 16
 
 
-def read_u8(f):
-    return struct.unpack('B', f.read(1))[0]
+def read_i8(buf, off):
+    return I8.unpack_from(buf, off)[0], off + 1
 
 
-def read_i16(f):
-    return struct.unpack('h', f.read(2))[0]
+def read_u8(buf, off):
+    # Indexing bytes gives the integer directly.
+    return buf[off], off + 1
 
 
-def read_u16(f):
-    return struct.unpack('H', f.read(2))[0]
+def read_i16(buf, off):
+    return I16.unpack_from(buf, off)[0], off + 2
 
 
-def read_i32(f):
-    return struct.unpack('i', f.read(4))[0]
+def read_u16(buf, off):
+    return U16.unpack_from(buf, off)[0], off + 2
 
 
-def read_u32(f):
-    return struct.unpack('I', f.read(4))[0]
+def read_i32(buf, off):
+    return I32.unpack_from(buf, off)[0], off + 4
 
 
-def read_i64(f):
-    return struct.unpack('q', f.read(8))[0]
+def read_u32(buf, off):
+    return U32.unpack_from(buf, off)[0], off + 4
 
 
-def read_u64(f):
-    return struct.unpack('Q', f.read(8))[0]
+def read_i64(buf, off):
+    return I64.unpack_from(buf, off)[0], off + 8
 
 
-def read_f32(f):
-    return struct.unpack('f', f.read(4))[0]
+def read_u64(buf, off):
+    return U64.unpack_from(buf, off)[0], off + 8
 
 
-def read_f64(f):
-    return struct.unpack('d', f.read(8))[0]
+def read_f32(buf, off):
+    return F32.unpack_from(buf, off)[0], off + 4
 
 
-def read_bool(f):
-    return struct.unpack('B', f.read(1))[0] > 0
+def read_f64(buf, off):
+    return F64.unpack_from(buf, off)[0], off + 8
 
 
-def read_cstr(f):
-    result = ''
-    byte = f.read(1)
-    while byte != b'\0' and byte != 0 and byte is not None:
-        result += chr(byte[0])
-        byte = f.read(1)
+def read_bool(buf, off):
+    return buf[off] > 0, off + 1
 
-    return result
 
+def read_cstr(buf, off):
+    # The terminating null byte is found by a single scan in C.
+    end = buf.find(0, off)
+    if end < 0:
+        raise ValueError(f'truncated input: unterminated string at offset {off}')
 
-def read_str(f):
-    return f'"{read_cstr(f)}"'
+    return buf[off:end].decode('utf8', 'replace'), end + 1
 
 
-def read_access(f):
-    value_type = f.read(1)
-    assert value_type in [TOKEN_VALUE_SCALAR, TOKEN_VALUE_STRUCTURAL,
-                          TOKEN_VALUE_ARRAY_LIKE], 'invalid value type'
+def read_str(buf, off):
+    value, off = read_cstr(buf, off)
+    return f'"{value}"', off
 
-    if value_type == TOKEN_VALUE_SCALAR:
-        return f'%{read_u64(f)}'
-    elif value_type == TOKEN_VALUE_STRUCTURAL:
-        return f'{read_access(f)}.{read_access(f)}'
-    elif value_type == TOKEN_VALUE_ARRAY_LIKE:
-        base = read_access(f)
-        count = read_u32(f)
-        index = ', '.join(sorted([read_access(f) for _ in range(count)]))
-        return f'{base}[{index}]'
 
+# Steps of the access parsing.
+READ_ACCESS = 0
+JOIN_STRUCTURAL = 1
+READ_INDEX_COUNT = 2
+JOIN_ARRAY_LIKE = 3
 
-def read_metadata(f):
-    raw_metadata = read_u8(f)
 
+def read_access(buf, off):
+    # Accesses are nested, they are parsed with an explicit stack of steps
+    # instead of recursion. The formatted parts are kept on a separate stack
+    # and joined once all parts of an access are read.
+    parts = []
+    steps = [(READ_ACCESS, None)]
+    while len(steps) > 0:
+        step, arg = steps.pop()
+
+        if step == READ_ACCESS:
+            value_type = buf[off:off + 1]
+            off += 1
+            assert value_type in [TOKEN_VALUE_SCALAR, TOKEN_VALUE_STRUCTURAL,
+                                  TOKEN_VALUE_ARRAY_LIKE], 'invalid value type'
+
+            if value_type == TOKEN_VALUE_SCALAR:
+                value, off = read_u64(buf, off)
+                parts.append(f'%{value}')
+            elif value_type == TOKEN_VALUE_STRUCTURAL:
+                # Base and field.
+                steps.append((JOIN_STRUCTURAL, None))
+                steps.append((READ_ACCESS, None))
+                steps.append((READ_ACCESS, None))
+            elif value_type == TOKEN_VALUE_ARRAY_LIKE:
+                # Base, then the number of indices followed by the indices.
+                steps.append((READ_INDEX_COUNT, None))
+                steps.append((READ_ACCESS, None))
+        elif step == JOIN_STRUCTURAL:
+            field = parts.pop()
+            base = parts.pop()
+            parts.append(f'{base}.{field}')
+        elif step == READ_INDEX_COUNT:
+            count, off = read_u32(buf, off)
+            steps.append((JOIN_ARRAY_LIKE, count))
+            steps.extend([(READ_ACCESS, None)] * count)
+        elif step == JOIN_ARRAY_LIKE:
+            start = len(parts) - arg
+            index = ', '.join(sorted(parts[start:]))
+            del parts[start:]
+            base = parts.pop()
+            parts.append(f'{base}[{index}]')
+
+    return parts[0], off
+
+
+def read_accesses(buf, off, count):
+    accesses = []
+    for _ in range(count):
+        access, off = read_access(buf, off)
+        accesses.append(access)
+
+    return ', '.join(sorted(accesses)), off
+
+
+def format_metadata(raw_metadata):
     if raw_metadata & META:
         meta = []
 
@@ -135,34 +194,55 @@ def read_metadata(f):
         return ''
 
 
-def get_static_handlers():
-    def _parse_stmt(f):
-        stmt_id = read_stmt(f)
-
-        n_succ = read_u8(f)
-        succ_ids = ', '.join(sorted([read_stmt(f) for _ in range(n_succ)]))
-
-        n_defs = read_u8(f)
-        defs = ', '.join(sorted([read_access(f) for _ in range(n_defs)]))
+# Metadata is a single byte, all its possible forms are formatted in advance.
+METADATA = [format_metadata(raw_metadata) for raw_metadata in range(256)]
 
-        n_uses = read_u8(f)
-        uses = ', '.join(sorted([read_access(f) for _ in range(n_uses)]))
 
-        loc = f'@{read_u64(f)} {read_u32(f)}:{read_u32(f)}-{read_u32(f)}:{read_u32(f)}'
+def read_metadata(buf, off):
+    return METADATA[buf[off]], off + 1
 
-        metadata = read_metadata(f)
 
-        return f'{stmt_id} -> {succ_ids}  ::  defs: {defs} / uses: {uses} [{loc}]{metadata}'
-
-    def _parse_func(f):
-        name = read_cstr(f)
-        return f'\nfunction: {name}\n'
-
-    def _parse_filenames(f):
-        n_filenames = read_u32(f)
-        filenames = '\n'.join(
-            [f'@{read_u64(f)} = {read_cstr(f)}' for _ in range(n_filenames)])
-        return f'\n{filenames}'
+def get_static_handlers():
+    def _parse_stmt(buf, off):
+        stmt_id, off = read_stmt(buf, off)
+
+        n_succ = buf[off]
+        off += 1
+        succ_ids = []
+        for _ in range(n_succ):
+            succ_id, off = read_stmt(buf, off)
+            succ_ids.append(succ_id)
+        succ_ids = ', '.join(sorted(succ_ids))
+
+        n_defs = buf[off]
+        off += 1
+        defs, off = read_accesses(buf, off, n_defs)
+
+        n_uses = buf[off]
+        off += 1
+        uses, off = read_accesses(buf, off, n_uses)
+
+        file_id, line, col, end_line, end_col = LOC.unpack_from(buf, off)
+        off += LOC.size
+        loc = f'@{file_id} {line}:{col}-{end_line}:{end_col}'
+
+        metadata, off = read_metadata(buf, off)
+
+        return f'{stmt_id} -> {succ_ids}  ::  defs: {defs} / uses: {uses} [{loc}]{metadata}', off
+
+    def _parse_func(buf, off):
+        name, off = read_cstr(buf, off)
+        return f'\nfunction: {name}\n', off
+
+    def _parse_filenames(buf, off):
+        n_filenames, off = read_u32(buf, off)
+        filenames = []
+        for _ in range(n_filenames):
+            file_id, off = read_u64(buf, off)
+            filename, off = read_cstr(buf, off)
+            filenames.append(f'@{file_id} = {filename}')
+        filenames = '\n'.join(filenames)
+        return f'\n{filenames}', off
 
     return {
         TOKEN_STATEMENT: _parse_stmt,
@@ -173,12 +253,19 @@ def get_static_handlers():
 
 def get_dynamic_handlers():
     def _prepend(prefix, handler):
-        return lambda f: f'{prefix}: {handler(f)}'
+        # The label is formatted once per token kind, not for every token.
+        label = f'{prefix}: '
+
+        def _handler(buf, off):
+            value, off = handler(buf, off)
+            return label + str(value), off
+
+        return _handler
 
     return {
         TOKEN_STATEMENT: _prepend('statement', read_stmt),
         TOKEN_EXTERNAL: _prepend('external', read_str),
-        TOKEN_DATA_UNSUPPORTED: lambda f: 'unsupported data type',
+        TOKEN_DATA_UNSUPPORTED: lambda buf, off: ('unsupported data type', off),
         TOKEN_DATA_I8: _prepend('i8', read_i8),
         TOKEN_DATA_I16: _prepend('i16', read_i16),
         TOKEN_DATA_I32: _prepend('i32', read_i32),
@@ -191,28 +278,50 @@ def get_dynamic_handlers():
         TOKEN_DATA_F64: _prepend('f64', read_f64),
         TOKEN_DATA_BOOL: _prepend('bool', read_bool),
         TOKEN_DATA_NAMED: _prepend('named', read_cstr),
-        TOKEN_DATA_NULL: lambda f: 'null',
+        TOKEN_DATA_NULL: lambda buf, off: ('null', off),
     }
 
 
+def make_jump_table(handlers):
+    # Jump table indexed directly by the token byte.
+    table = [None] * 256
+    for token, handler in handlers.items():
+        table[token[0]] = handler
+
+    return table
+
+
+# The handlers do not depend on the parsed file, the tables are built once.
+STATIC_HANDLERS = make_jump_table(get_static_handlers())
+DYNAMIC_HANDLERS = make_jump_table(get_dynamic_handlers())
+
+
 def parse(filename):
-    output = ''
+    # Lines are collected and joined once, repeated string concatenation
+    # would copy the whole output for every token.
+    output = []
+    append = output.append
 
+    # The whole file is read at once and the values are unpacked directly
+    # from the buffer, instead of a read call for every field.
     with open(filename, 'rb') as fh:
-        header = fh.read(7)
-        assert header == HEADER_STATIC or header == HEADER_DYNAMIC, 'invalid header'
+        buf = fh.read()
+
+    header = buf[:7]
+    assert header == HEADER_STATIC or header == HEADER_DYNAMIC, 'invalid header'
 
-        handlers = get_static_handlers() if header == HEADER_STATIC else get_dynamic_handlers()
+    table = STATIC_HANDLERS if header == HEADER_STATIC else DYNAMIC_HANDLERS
 
-        token = fh.read(1)
-        while token is not None and token != 0 and len(token) == 1:
-            token_value = int.from_bytes(token, byteorder=sys.byteorder)
-            message = 'invalid token identifier: 0x{:02x}'.format(token_value)
-            assert token in handlers, message
+    off = 7
+    while off < len(buf):
+        token = buf[off]
+        off += 1
 
-            handler = handlers[token]
-            output += handler(fh) + '\n'
+        handler = table[token]
+        assert handler is not None, 'invalid token identifier: 0x{:02x}'.format(token)
 
-            token = fh.read(1)
+        result, off = handler(buf, off)
+        append(result)
+        append('\n')
 
-    return output
+    return ''.join(output)